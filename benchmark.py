@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+# Pacewar benchmark
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Runs scripted headless scenarios at increasing team sizes and prints
+# one JSON object per run with the tick rate and a per-tick breakdown of
+# where the time went.  Each run happens in its own process so that no
+# state leaks from one run to the next.
+
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import sge
+
+import pacewar
+
+
+SCENARIOS = ["storm", "steady"]
+CATEGORIES = ["physics", "ai", "collision", "create_destroy"]
+
+# Methods that are timed, by category.  Time is counted exclusively:
+# when a timed method calls another one (e.g. a collision destroys a
+# ship), the inner call's time goes to the inner method's category.
+TIMED = {
+    "physics": [(pacewar.Ship, "event_update_position"),
+                (pacewar.Ship, "update_movement"),
+                (pacewar.Bullet, "event_update_position"),
+                (pacewar.PhysicsEngine, "step")],
+    "ai": [(pacewar.AI, "event_step"),
+           (pacewar.AI, "event_alarm"),
+           (pacewar.BatchedAI, "step"),
+           (pacewar.AIScheduler, "step")],
+    "collision": [(sge.dsp, "o_detect_collisions"),
+                  (pacewar.CollisionQueue, "resolve"),
+                  (pacewar.SweptCollision, "step")],
+    "create_destroy": [(sge.dsp.Room, "add"),
+                       (sge.dsp.Room, "remove")]}
+
+
+class Timers:
+
+    def __init__(self):
+        self.enabled = False
+        self.totals = {category: 0 for category in CATEGORIES}
+        self.calls = {category: 0 for category in CATEGORIES}
+        self.stack = []
+
+    def wrap(self, category, function):
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+
+            # Each stack entry holds the time spent in nested timed calls
+            self.stack.append(0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = self.stack.pop()
+                self.totals[category] += elapsed - nested
+                self.calls[category] += 1
+                if self.stack:
+                    self.stack[-1] += elapsed
+
+        return timed
+
+    def install(self):
+        for category, targets in TIMED.items():
+            for owner, name in targets:
+                setattr(owner, name, self.wrap(category,
+                                               getattr(owner, name)))
+
+
+class BenchmarkRoom(pacewar.Room):
+
+    # Runs a scenario: "storm" restarts the round every storm_interval
+    # ticks, so the cost is dominated by creating and destroying whole
+    # fleets; "steady" just lets the fight go on.  Only the ticks after
+    # the warmup are measured.
+
+    def setup(self, scenario, warmup, ticks, storm_interval, timers):
+        self.scenario = scenario
+        self.warmup = warmup
+        self.ticks = ticks
+        self.storm_interval = storm_interval
+        self.timers = timers
+        self.tick = 0
+        self.start_time = None
+        self.end_time = None
+        self.ship_ticks = 0
+        self.bullet_ticks = 0
+
+    def event_step(self, time_passed, delta_mult):
+        if self.tick == self.warmup:
+            self.timers.enabled = True
+            self.start_time = time.perf_counter()
+        elif self.tick == self.warmup + self.ticks:
+            self.end_time = time.perf_counter()
+            self.timers.enabled = False
+            sge.game.end()
+            return
+
+        if self.tick >= self.warmup:
+            for team in [pacewar.TEAM_RED, pacewar.TEAM_GREEN]:
+                self.ship_ticks += len(pacewar.team_ships[team])
+                self.bullet_ticks += len(pacewar.team_bullets[team])
+
+        self.tick += 1
+        if (self.scenario == "storm" and self.tick > 1 and
+                self.tick % self.storm_interval == 0):
+            self.round_start()
+
+        super(BenchmarkRoom, self).event_step(time_passed, delta_mult)
+
+
+def run(config):
+    # Run a single benchmark in this process and return its result.
+    pacewar.TEAM_SIZE = config["team_size"]
+    pacewar.SHOOT_WAIT = config["shoot_wait"]
+    pacewar.headless = True
+    pacewar.points_to_win = sys.maxsize
+    modes = config["modes"]
+    if "numpy-physics" in modes:
+        pacewar.physics = pacewar.PhysicsEngine()
+    if "batched-ai" in modes:
+        pacewar.ai_batches = {
+            pacewar.TEAM_RED: pacewar.BatchedAI(pacewar.TEAM_RED),
+            pacewar.TEAM_GREEN: pacewar.BatchedAI(pacewar.TEAM_GREEN)}
+    if "swept-collision" in modes:
+        pacewar.swept_collision = pacewar.SweptCollision()
+    if "ai-scheduler" in modes:
+        pacewar.ai_scheduler = pacewar.AIScheduler()
+    pacewar.set_seed(config["seed"])
+
+    timers = Timers()
+    timers.install()
+
+    pacewar.create_game()
+    pacewar.load_assets()
+    room = BenchmarkRoom(width=pacewar.ROOM_WIDTH,
+                         height=pacewar.ROOM_HEIGHT,
+                         object_area_width=64, object_area_height=64)
+    room.setup(config["scenario"], config["warmup"], config["ticks"],
+               config["storm_interval"], timers)
+    sge.game.start_room = room
+    sge.game.start()
+
+    ticks = config["ticks"]
+    seconds = room.end_time - room.start_time
+    ms_per_tick = {category: timers.totals[category] * 1000 / ticks
+                   for category in CATEGORIES}
+    ms_per_tick["other"] = max(0, seconds * 1000 / ticks -
+                               sum(ms_per_tick.values()))
+    result = dict(config)
+    result.update({
+        "version": pacewar.__version__,
+        "python": platform.python_version(),
+        "seconds": seconds,
+        "ticks_per_second": ticks / seconds,
+        "ms_per_tick": ms_per_tick,
+        "calls_per_tick": {category: timers.calls[category] / ticks
+                           for category in CATEGORIES},
+        "mean_ships": room.ship_ticks / ticks,
+        "mean_bullets": room.bullet_ticks / ticks})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Benchmark the Pacewar simulation at increasing scale.")
+    parser.add_argument(
+        "--sizes", default="8,16,32,64,128,256,512,1024",
+        help="Comma-separated ships per side to run (default: %(default)s).")
+    parser.add_argument(
+        "--shoot-waits", default="15,5",
+        help="Comma-separated SHOOT_WAIT values; lower values mean more "
+             "bullets (default: %(default)s).")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS),
+        help="Comma-separated scenarios out of {} (default: "
+             "%(default)s).".format(", ".join(SCENARIOS)))
+    parser.add_argument(
+        "--ticks", type=int, default=300,
+        help="Ticks to measure per run (default: %(default)s).")
+    parser.add_argument(
+        "--warmup", type=int, default=300,
+        help="Ticks to run before measuring the steady scenario, long "
+             "enough for the fleets to meet (default: %(default)s).  The "
+             "storm scenario is measured after its first restart.")
+    parser.add_argument(
+        "--storm-interval", type=int, default=10,
+        help="Ticks between round restarts in the storm scenario "
+             "(default: %(default)s).")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Simulation seed (default: %(default)s).")
+    parser.add_argument(
+        "--numpy-physics", action="store_true",
+        help="Benchmark with the NumPy physics engine.")
+    parser.add_argument(
+        "--batched-ai", action="store_true",
+        help="Benchmark with batched AI.")
+    parser.add_argument(
+        "--swept-collision", action="store_true",
+        help="Benchmark with swept-circle collision.")
+    parser.add_argument(
+        "--ai-scheduler", action="store_true",
+        help="Benchmark with the time-sliced AI scheduler.")
+    parser.add_argument(
+        "-o", "--output",
+        help="Append results to this file as JSON lines instead of "
+             "printing them.")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(json.loads(args.run))))
+        return
+
+    modes = [mode for mode in ["numpy-physics", "batched-ai",
+                               "swept-collision", "ai-scheduler"]
+             if getattr(args, mode.replace("-", "_"))]
+    if (args.numpy_physics or args.batched_ai) and pacewar.numpy is None:
+        parser.error("--numpy-physics and --batched-ai require NumPy")
+
+    for scenario in args.scenarios.split(","):
+        if scenario not in SCENARIOS:
+            parser.error("unknown scenario: {}".format(scenario))
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for scenario in args.scenarios.split(","):
+            for shoot_wait in args.shoot_waits.split(","):
+                for team_size in args.sizes.split(","):
+                    config = {"scenario": scenario,
+                              "team_size": int(team_size),
+                              "shoot_wait": int(shoot_wait),
+                              "ticks": args.ticks,
+                              "warmup": (args.warmup if scenario == "steady"
+                                         else args.storm_interval),
+                              "storm_interval": args.storm_interval,
+                              "seed": args.seed, "modes": modes}
+                    out = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--run",
+                         json.dumps(config)],
+                        stdout=subprocess.PIPE, universal_newlines=True,
+                        check=True).stdout
+                    # pygame prints a greeting, so keep only the result
+                    print(out.strip().splitlines()[-1], file=output)
+                    output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Pacewar texture atlas builder
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Packs the game's small static sprites into one image, with an index of
+# where each sprite's frames are and what origin it is drawn from, so
+# that the game can load them all with a single file decode.  Run this
+# again whenever any of the packed images change.
+
+
+import argparse
+import json
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import pacewar
+
+
+# Sprites to pack.  Backgrounds and animations are left out: they are
+# big enough that packing them would mostly add empty space.
+SPRITES = ["Spaceship14", "Spaceship14B", "Spaceship15", "Spaceship15B",
+           "Spaceship16", "Spaceship16B", "bullet_red", "bullet_green",
+           "colorblind_red", "colorblind_green", "meter_left", "meter_right",
+           "meter_center", "meter_back", "meter_red", "meter_green",
+           "target", "logo"]
+
+# Space left around each frame, so that nothing bleeds into its
+# neighbours when a frame is scaled or rotated.
+PADDING = 1
+
+
+def record_origins():
+    # Load the game's assets the way the game does and return the
+    # origin each packed sprite is loaded with.
+    origins = {}
+    load_sprite = pacewar.load_sprite
+
+    def recording_load_sprite(name, **kwargs):
+        sprite = load_sprite(name, **kwargs)
+        origins[name] = (sprite.origin_x, sprite.origin_y)
+        return sprite
+
+    pacewar.load_sprite = recording_load_sprite
+    try:
+        pacewar.create_game()
+        pacewar.load_assets()
+        pacewar.asset_loader.finish()
+    finally:
+        pacewar.load_sprite = load_sprite
+
+    return origins
+
+
+def pack(sizes, width):
+    # Place rectangles of the given sizes in rows no wider than width,
+    # tallest first, and return their positions and the total height.
+    positions = {}
+    x = y = row_height = 0
+    for key in sorted(sizes, key=lambda key: (-sizes[key][1], key)):
+        w, h = sizes[key]
+        if x + w + PADDING * 2 > width and x:
+            x = 0
+            y += row_height
+            row_height = 0
+        positions[key] = (x + PADDING, y + PADDING)
+        x += w + PADDING * 2
+        row_height = max(row_height, h + PADDING * 2)
+
+    return positions, y + row_height
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="build_atlas",
+        description="Pack Pacewar's static sprites into a texture atlas.")
+    parser.add_argument(
+        "--width", type=int, default=1024,
+        help="Width of the atlas image (default: %(default)s).")
+    args = parser.parse_args()
+
+    # The atlas must be built from the original files, not from an older
+    # atlas or the asset cache.
+    for fname in [pacewar.ATLAS_IMAGE, pacewar.ATLAS_INDEX]:
+        if os.path.exists(fname):
+            os.remove(fname)
+    origins = record_origins()
+
+    images = {}
+    for name in SPRITES:
+        fname = os.path.join(pacewar.DATA_IMAGES, name + ".png")
+        # Converting turns colorkey transparency into alpha, as SGE does
+        images[name] = pygame.image.load(fname).convert_alpha()
+    widest = max(image.get_width() for image in images.values())
+    if widest + PADDING * 2 > args.width:
+        parser.error("--width must be at least {}".format(
+            widest + PADDING * 2))
+
+    positions, height = pack({name: image.get_size()
+                              for name, image in images.items()},
+                             args.width)
+    atlas = pygame.Surface((args.width, height), pygame.SRCALPHA, 32)
+    atlas.fill((0, 0, 0, 0))
+    index = {}
+    for name in SPRITES:
+        image = images[name]
+        x, y = positions[name]
+        atlas.blit(image, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+        index[name] = {"frames": [[x, y, image.get_width(),
+                                   image.get_height()]],
+                       "origin": list(origins[name])}
+
+    pygame.image.save(atlas, pacewar.ATLAS_IMAGE)
+    with open(pacewar.ATLAS_INDEX, 'w') as f:
+        json.dump(index, f, indent=4, sort_keys=True)
+    print("Packed {} sprites into a {}x{} atlas.".format(
+        len(SPRITES), args.width, height))
+
+
+if __name__ == '__main__':
+    main()
@@ -19,16 +19,33 @@
 __version__ = "1.6.8a0"
 
 
+import argparse
+import collections
+import hashlib
+import heapq
+import itertools
 import json
 import math
+import mmap
 import os
 import random
 import sys
 import time
+import struct
 import warnings
 
+import pygame
 import sge
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# CPU time taken to start the interpreter and import everything above,
+# for --startup-report.
+IMPORT_TIME = time.process_time()
+
 
 if getattr(sys, "frozen", False):
     __file__ = sys.executable
@@ -69,6 +86,45 @@ BULLET_LIFE = 15
 DANGER_DISTANCE = BULLET_SPEED * BULLET_LIFE * 1.25
 DANGER_ANGLE = 15
 
+GRID_CELL_SIZE = 192
+
+# Ships more than LOD_MARGIN pixels outside of every view are not drawn,
+# and unless the run is seeded, their AI rethinks its target and threats
+# LOD_AI_SLOWDOWN times less often.  The margin covers how far a view
+# can move in one frame.
+LOD_MARGIN = 64
+LOD_AI_SLOWDOWN = 3
+
+# With the AI scheduler, the AI decisions made each tick may take this
+# many seconds.  Seeded runs can't depend on how fast the computer is,
+# so there it allows as many decisions as would take that long at
+# AI_JOB_COST seconds each.
+AI_BUDGET = 0.003
+AI_JOB_COST = 0.00004
+
+# Ships, bullets and exhaust are drawn from copies of their sprites
+# pre-rotated to this many angles.
+ROTATION_STEPS = 128
+ROTATION_ATLAS_BUDGET = 32 * 1024 * 1024
+
+# Nebula background layers are cut into square tiles of this size.
+NEBULA_TILE_SIZE = 256
+
+# Battle sounds can each play this many times at once.  Sounds made
+# within VOICE_MERGE_DISTANCE of a louder one in the same frame are
+# heard as that one, and sounds outside of every view get quieter with
+# distance until they are VOICE_FALLOFF pixels away.
+VOICE_BUDGETS = {"shoot": 4, "explode": 3, "dissipate": 2}
+VOICE_MERGE_DISTANCE = 48
+VOICE_FALLOFF = 1280
+
+# Bounding boxes (x, y, width, height) of the ship and bullet sprites.
+# These are kept separately from the sprites so that the simulation can
+# run without loading any images.
+SHIP_BBOXES = [(-17, -17, 33, 33), (-16, -16, 32, 32), (-14, -14, 28, 28)]
+BULLET_BBOX = (-8, -16, 17, 33)
+BULLET_RADIUS = 8
+
 MENU_MAIN = 0
 MENU_START = 6
 MENU_CONTROLS = 1
@@ -92,11 +148,114 @@ MENU_SPACING = 16
 
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".pacewar")
 
+# Layout of the asset cache file: the magic string, the length of the
+# JSON header as a 32-bit little-endian integer, the header, then the
+# images' raw RGBA pixels starting at the next page boundary.
+ASSET_CACHE_FILE = os.path.join(CONFIG_DIR, "assets.cache")
+ASSET_CACHE_MAGIC = b"PACEWAR ASSETS\n\0"
+ASSET_CACHE_FORMAT = 1
+ASSET_CACHE_ALIGN = 4096
+
+# Texture atlas made by build_atlas.py, and its index of the frames and
+# origin of each sprite packed into it.
+ATLAS_IMAGE = os.path.join(DATA_IMAGES, "atlas.png")
+ATLAS_INDEX = os.path.join(DATA_IMAGES, "atlas.json")
+
+
+class EntityRegistry:
+
+    # Set of live entities with O(1) insertion, removal and liveness
+    # checks.  Entities are kept in a dense list (removing one moves the
+    # last entity into its place), so the registry can be iterated,
+    # indexed and passed to random.choice like a list.  Each entity is
+    # given a handle when it is added; handles are never reused, so a
+    # handle simply stops being alive once its entity is removed.
+
+    next_handle = 1
+
+    def __init__(self):
+        self.entities = []
+        self.handles = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def __getitem__(self, i):
+        return self.entities[i]
+
+    def add(self, entity):
+        handle = EntityRegistry.next_handle
+        EntityRegistry.next_handle += 1
+        self.positions[handle] = len(self.entities)
+        self.entities.append(entity)
+        self.handles.append(handle)
+        return handle
+
+    def remove(self, handle):
+        i = self.positions.pop(handle, None)
+        if i is None:
+            return
+
+        last_entity = self.entities.pop()
+        last_handle = self.handles.pop()
+        if last_handle != handle:
+            self.entities[i] = last_entity
+            self.handles[i] = last_handle
+            self.positions[last_handle] = i
+
+    def alive(self, handle):
+        return handle in self.positions
+
+    def get(self, handle):
+        i = self.positions.get(handle)
+        return self.entities[i] if i is not None else None
+
+
 colorblind = True
 points_to_win = 3
-
-ships_lists = {TEAM_RED: [], TEAM_GREEN: []}
-bullets_lists = {TEAM_RED: [], TEAM_GREEN: []}
+headless = False
+headless_matches = 1
+headless_results = []
+physics = None
+spatial_grid = None
+ai_batches = None
+ai_scheduler = None
+bullet_pool = None
+ship_pool = None
+swept_collision = None
+collision_queue = None
+
+# Random number stream used by the simulation.  Passing a seed makes it
+# (and SGE's own use of the random module) repeatable, and fixes the
+# frame time so that every run with that seed plays out identically.
+rng = random.Random()
+seed = None
+
+profiler = None
+rotation_steps = ROTATION_STEPS
+rotation_atlas = None
+draw_batch = None
+view_index = None
+voices = None
+nebulae = []
+asset_cache = None
+asset_loader = None
+texture_atlas = None
+memory_report = None
+
+# Phases of starting the game and how long each took, if a startup
+# report was asked for.
+startup_report = None
+
+# Score meters already drawn, by (score, points to win, colorblind).
+meter_cache = {}
+
+team_ships = {TEAM_RED: EntityRegistry(), TEAM_GREEN: EntityRegistry()}
+team_bullets = {TEAM_RED: EntityRegistry(), TEAM_GREEN: EntityRegistry()}
 
 player1_key_thrust = "up"
 player1_key_left = "left"
@@ -119,12 +278,21 @@ player2_js_shoot = (1, "button", 1)
 class Game(sge.dsp.Game):
 
     def event_step(self, time_passed, delta_mult):
+        if asset_loader is not None:
+            asset_loader.step()
+
         x = self.width / 2 - meter_sprite.width / 2
         y = 64
         self.project_sprite(meter_sprite, 0, x, y)
 
+        if profiler is not None and profiler.enabled:
+            profiler.end_frame()
+            self.project_text(menu_font, profiler.overlay_text(), 16, 16,
+                              color=sge.gfx.Color("white"))
+
     def event_key_press(self, key, char):
         global colorblind
+        global profiler
 
         if key == "f7":
             colorblind = not colorblind
@@ -132,6 +300,10 @@ class Game(sge.dsp.Game):
         elif key == "f8":
             fname = "screenshot-{}.png".format(round(time.time(), 3))
             sge.gfx.Sprite.from_screenshot().save(fname)
+        elif key == "f9":
+            if profiler is None:
+                profiler = Profiler()
+            profiler.toggle()
         elif key == "f11":
             if self.fullscreen:
                 self.scale = SCALE
@@ -140,6 +312,20 @@ class Game(sge.dsp.Game):
             else:
                 self.fullscreen = True
 
+    def refresh(self):
+        # The views have followed the players since the room's step.
+        view_index.update(self.current_room)
+        for nebula in nebulae:
+            nebula.update(self.current_room)
+        if draw_batch is not None:
+            draw_batch.flush()
+        if voices is not None:
+            voices.flush()
+        super(Game, self).refresh()
+
+        if startup_report is not None:
+            print_startup_report()
+
     def event_close(self):
         self.end()
 
@@ -150,119 +336,225 @@ class Game(sge.dsp.Game):
         self.event_close()
 
 
+class HeadlessGame(Game):
+
+    # Game which runs the simulation as fast as possible without
+    # drawing anything or waiting for the next frame.
+
+    def __init__(self, *args, **kwargs):
+        super(HeadlessGame, self).__init__(*args, **kwargs)
+        self.ticks = 0
+
+    def regulate_speed(self, fps=None):
+        self.ticks += 1
+        return 1000 / self.fps
+
+    def refresh(self):
+        pass
+
+    def event_step(self, time_passed, delta_mult):
+        if profiler is not None and profiler.enabled:
+            profiler.end_frame()
+
+    def event_key_press(self, key, char):
+        pass
+
+
 class Room(sge.dsp.Room):
 
     def event_room_start(self):
+        global spatial_grid
+        global collision_queue
+        global bullet_pool
+        global ship_pool
+
+        spatial_grid = SpatialGrid()
+        if seed is not None and swept_collision is None:
+            collision_queue = CollisionQueue()
+        else:
+            collision_queue = None
+        if bullet_pool is None:
+            bullet_pool = BulletPool()
+        if ship_pool is None:
+            ship_pool = ShipPool()
+        # Ships and bullets left over from the previous room are still
+        # registered with physics and the grid.
+        self.clear_fleets()
         self.score = 0
         self.round_counter = 0
         self.started = False
         self.finished = False
         self.multiplayer = False
+        self.animation_time = 0
         self.menu = MENU_MAIN
         self.menu_selection = 0
         self.menu_sprite = None
+        self.menu_state = None
         self.menu_axes = {}
-        self.round_end()
-        self.alarms["check_win"] = 5
-        self.update_meter()
+
+        if headless:
+            self.rounds = 0
+            self.start_ticks = sge.game.ticks
+            self.round_start()
+        else:
+            self.round_end()
+            self.alarms["check_win"] = 5
+            self.update_meter()
 
     def event_step(self, time_passed, delta_mult):
+        self.animation_time += time_passed
+        view_index.update(self)
+
+        if collision_queue is not None:
+            collision_queue.resolve()
+
+        if physics is not None:
+            physics.step(delta_mult)
+
+        # Everything that asks the grid this frame sees objects where
+        # they are now: after the physics engine has moved them, or,
+        # without it, before SGE moves them at the end of the frame.
+        spatial_grid.rebuild()
+
+        if swept_collision is not None:
+            swept_collision.step(delta_mult)
+
+        if ai_scheduler is not None:
+            ai_scheduler.step()
+
+        if ai_batches is not None:
+            for batch in ai_batches.values():
+                batch.step(delta_mult)
+        elif seed is not None:
+            # SGE runs events in an order that depends on object ids, so
+            # seeded runs step the AIs here in registry order instead.
+            for team in [TEAM_RED, TEAM_GREEN]:
+                for ship in list(team_ships[team]):
+                    if isinstance(ship.controller, AI):
+                        ship.controller.update(time_passed, delta_mult)
+
+        if seed is not None:
+            # Likewise for bullets whose death alarm would go off when
+            # SGE updates them, since removing from a registry reorders
+            # it.
+            for team in [TEAM_RED, TEAM_GREEN]:
+                for bullet in list(team_bullets[team]):
+                    if bullet.alarms.get("death", math.inf) <= delta_mult:
+                        bullet.destroy()
+
         if not self.started:
             sge.game.project_sprite(logo_sprite, 0, sge.game.width / 2, 96)
 
-            if self.menu == MENU_KEYS_PLAYER1:
-                menu_items = [f"Thrust:  {player1_key_thrust}",
-                              f"Left:    {player1_key_left}",
-                              f"Right:   {player1_key_right}",
-                              f"Shoot:   {player1_key_shoot}",
-                              "Back"]
-            elif self.menu == MENU_KEYS_PLAYER2:
-                menu_items = [f"Thrust:  {player2_key_thrust}",
-                              f"Left:    {player2_key_left}",
-                              f"Right:   {player2_key_right}",
-                              f"Shoot:   {player2_key_shoot}",
-                              "Back"]
-            elif self.menu == MENU_JS_PLAYER1:
-                thrust = "None"
-                left = "None"
-                right = "None"
-                shoot = "None"
-                if player1_js_thrust:
-                    thrust = "Joystick {} {} {}".format(*player1_js_thrust)
-                if player1_js_left:
-                    left = "Joystick {} {} {}".format(*player1_js_left)
-                if player1_js_right:
-                    right = "Joystick {} {} {}".format(*player1_js_right)
-                if player1_js_shoot:
-                    shoot = "Joystick {} {} {}".format(*player1_js_shoot)
-
-                menu_items = [f"Thrust:  {thrust}",
-                              f"Left:    {left}",
-                              f"Right:   {right}",
-                              f"Shoot:   {shoot}",
-                              "Back"]
-            elif self.menu == MENU_JS_PLAYER2:
-                thrust = "None"
-                left = "None"
-                right = "None"
-                shoot = "None"
-                if player2_js_thrust:
-                    thrust = "Joystick {} {} {}".format(*player2_js_thrust)
-                if player2_js_left:
-                    left = "Joystick {} {} {}".format(*player2_js_left)
-                if player2_js_right:
-                    right = "Joystick {} {} {}".format(*player2_js_right)
-                if player2_js_shoot:
-                    shoot = "Joystick {} {} {}".format(*player2_js_shoot)
-
-                menu_items = [f"Thrust:  {thrust}",
-                              f"Left:    {left}",
-                              f"Right:   {right}",
-                              f"Shoot:   {shoot}",
-                              "Back"]
+            # Only redraw the menu when what it shows has changed.
+            menu_state = (self.menu, self.menu_selection,
+                          player1_key_thrust, player1_key_left,
+                          player1_key_right, player1_key_shoot,
+                          player2_key_thrust, player2_key_left,
+                          player2_key_right, player2_key_shoot,
+                          player1_js_thrust, player1_js_left,
+                          player1_js_right, player1_js_shoot,
+                          player2_js_thrust, player2_js_left,
+                          player2_js_right, player2_js_shoot)
+            if menu_state != self.menu_state:
+                self.menu_state = menu_state
+                self.redraw_menu()
+
+            sge.game.project_sprite(
+                self.menu_sprite, 0,
+                sge.game.width / 2 - self.menu_sprite.width / 2, 240)
+        elif self.finished and not headless:
+            if not music.playing:
+                create_room().start()
+
+    def redraw_menu(self):
+        if self.menu == MENU_KEYS_PLAYER1:
+            menu_items = [f"Thrust:  {player1_key_thrust}",
+                          f"Left:    {player1_key_left}",
+                          f"Right:   {player1_key_right}",
+                          f"Shoot:   {player1_key_shoot}",
+                          "Back"]
+        elif self.menu == MENU_KEYS_PLAYER2:
+            menu_items = [f"Thrust:  {player2_key_thrust}",
+                          f"Left:    {player2_key_left}",
+                          f"Right:   {player2_key_right}",
+                          f"Shoot:   {player2_key_shoot}",
+                          "Back"]
+        elif self.menu == MENU_JS_PLAYER1:
+            thrust = "None"
+            left = "None"
+            right = "None"
+            shoot = "None"
+            if player1_js_thrust:
+                thrust = "Joystick {} {} {}".format(*player1_js_thrust)
+            if player1_js_left:
+                left = "Joystick {} {} {}".format(*player1_js_left)
+            if player1_js_right:
+                right = "Joystick {} {} {}".format(*player1_js_right)
+            if player1_js_shoot:
+                shoot = "Joystick {} {} {}".format(*player1_js_shoot)
+
+            menu_items = [f"Thrust:  {thrust}",
+                          f"Left:    {left}",
+                          f"Right:   {right}",
+                          f"Shoot:   {shoot}",
+                          "Back"]
+        elif self.menu == MENU_JS_PLAYER2:
+            thrust = "None"
+            left = "None"
+            right = "None"
+            shoot = "None"
+            if player2_js_thrust:
+                thrust = "Joystick {} {} {}".format(*player2_js_thrust)
+            if player2_js_left:
+                left = "Joystick {} {} {}".format(*player2_js_left)
+            if player2_js_right:
+                right = "Joystick {} {} {}".format(*player2_js_right)
+            if player2_js_shoot:
+                shoot = "Joystick {} {} {}".format(*player2_js_shoot)
+
+            menu_items = [f"Thrust:  {thrust}",
+                          f"Left:    {left}",
+                          f"Right:   {right}",
+                          f"Shoot:   {shoot}",
+                          "Back"]
+        else:
+            menu_items = MENU_ITEMS[self.menu]
+
+        line_w = max([menu_font.get_width(x) for x in menu_items])
+        line_h = max([menu_font.get_height(x) for x in menu_items])
+        menu_w = line_w + MENU_BORDER * 2
+        menu_h = (line_h * len(menu_items) + MENU_BORDER * 2 +
+                  MENU_SPACING * (len(menu_items) - 1))
+
+        if (self.menu_sprite is None or
+                (self.menu_sprite.width != menu_w or
+                 self.menu_sprite.height != menu_h)):
+            self.menu_sprite = sge.gfx.Sprite(width=menu_w, height=menu_h)
+
+        self.menu_sprite.draw_lock()
+        self.menu_sprite.draw_clear()
+
+        for i in range(len(menu_items)):
+            font = (selection_font if self.menu_selection == i else
+                    menu_font)
+            x = MENU_BORDER
+            y = MENU_BORDER + (line_h + MENU_SPACING) * i
+
+            # Colorblind accessibility
+            if self.menu_selection == i:
+                txt = "<{}>".format(menu_items[i])
             else:
-                menu_items = MENU_ITEMS[self.menu]
-
-            line_w = max([menu_font.get_width(x) for x in menu_items])
-            line_h = max([menu_font.get_height(x) for x in menu_items])
-            menu_w = line_w + MENU_BORDER * 2
-            menu_h = (line_h * len(menu_items) + MENU_BORDER * 2 +
-                      MENU_SPACING * (len(menu_items) - 1))
-
-            if (self.menu_sprite is None or
-                    (self.menu_sprite.width != menu_w or
-                     self.menu_sprite.height != menu_h)):
-                self.menu_sprite = sge.gfx.Sprite(width=menu_w, height=menu_h)
-
-            self.menu_sprite.draw_lock()
-            self.menu_sprite.draw_clear()
-
-            for i in range(len(menu_items)):
-                font = (selection_font if self.menu_selection == i else
-                        menu_font)
-                x = MENU_BORDER
-                y = MENU_BORDER + (line_h + MENU_SPACING) * i
-
-                # Colorblind accessibility
-                if self.menu_selection == i:
-                    txt = "<{}>".format(menu_items[i])
-                else:
-                    txt = menu_items[i]
+                txt = menu_items[i]
 
-                self.menu_sprite.draw_text(font, txt, x, y,
-                                           color=sge.gfx.Color("white"))
+            self.menu_sprite.draw_text(font, txt, x, y,
+                                       color=sge.gfx.Color("white"))
 
-            self.menu_sprite.draw_unlock()
-            sge.game.project_sprite(self.menu_sprite, 0,
-                                    sge.game.width / 2 - menu_w / 2, 240)
-        elif self.finished:
-            if not music.playing:
-                create_room().start()
+        self.menu_sprite.draw_unlock()
 
     def event_alarm(self, alarm_id):
         if alarm_id == "check_win":
-            red_alive = bool(ships_lists[TEAM_RED])
-            green_alive = bool(ships_lists[TEAM_GREEN])
+            red_alive = bool(team_ships[TEAM_RED])
+            green_alive = bool(team_ships[TEAM_GREEN])
 
             if red_alive and green_alive:
                 self.alarms["check_win"] = 5
@@ -484,63 +776,39 @@ class Room(sge.dsp.Room):
     def update_meter(self):
         global meter_sprite
 
-        meter_w = (meter_left_sprite.width + meter_right_sprite.width +
-                   meter_center_sprite.width +
-                   meter_back_sprite.width * points_to_win * 2)
-        if meter_sprite.width != meter_w:
-            meter_sprite = sge.gfx.Sprite(width=meter_w, height=16)
-
-        w = meter_back_sprite.width
-        h = meter_back_sprite.height
-
-        green_meter = sge.gfx.Sprite(width=(w * points_to_win), height=h)
-        red_meter = sge.gfx.Sprite(width=green_meter.width, height=h)
-
-        green_meter.draw_lock()
-        red_meter.draw_lock()
-
-        for i in range(points_to_win):
-            green_meter.draw_sprite(meter_back_sprite, 0, w * i, 0)
-            red_meter.draw_sprite(meter_back_sprite, 0, w * i, 0)
-
-        if self.score > 0:
-            for i in range(self.score):
-                x = w * i
-                green_meter.draw_sprite(meter_sprites[TEAM_GREEN], 0, x, 0)
-                if colorblind:
-                    green_meter.draw_sprite(colorblind_sprites[TEAM_GREEN], 0,
-                                            x + w / 2 - 8, 0)
-        elif self.score < 0:
-            for i in range(abs(self.score)):
-                x = red_meter.width - w * i
-                red_meter.draw_sprite(meter_sprites[TEAM_RED], 0, x, 0)
-                if colorblind:
-                    red_meter.draw_sprite(colorblind_sprites[TEAM_RED], 0,
-                                          x - w / 2 - 8, 0)
-
-        green_meter.draw_unlock()
-        red_meter.draw_unlock()
-
-        x = 0
-        meter_sprite.draw_lock()
-        meter_sprite.draw_clear()
-        for sprite in [meter_left_sprite, red_meter, meter_center_sprite,
-                       green_meter, meter_right_sprite]:
-            meter_sprite.draw_sprite(sprite, 0, x, 0)
-            x += sprite.width
-        meter_sprite.draw_unlock()
+        if headless:
+            return
 
-    def round_start(self):
+        key = (self.score, points_to_win, colorblind)
+        if key not in meter_cache:
+            meter_cache[key] = create_meter(*key)
+        meter_sprite = meter_cache[key]
+
+    def clear_fleets(self):
+        # Return every ship and bullet to its pool.  Their controllers
+        # go with them, so the players are forgotten first.
         global player1
         global player2
         player1 = None
         player2 = None
 
-        for ship in ships_lists[TEAM_RED] + ships_lists[TEAM_GREEN]:
+        for ship in list(team_ships[TEAM_RED]) + list(team_ships[TEAM_GREEN]):
             ship.destroy()
-        for bullet in bullets_lists[TEAM_RED] + bullets_lists[TEAM_GREEN]:
+        for bullet in (list(team_bullets[TEAM_RED]) +
+                       list(team_bullets[TEAM_GREEN])):
             bullet.destroy()
 
+    def round_start(self):
+        global player1
+        global player2
+
+        self.clear_fleets()
+        bullet_pool.trim()
+
+        if asset_loader is not None:
+            asset_loader.finish()
+        if memory_report is not None:
+            memory_report.sample(self, "round_start")
         if not music.playing:
             music.play(loops=None)
 
@@ -553,11 +821,13 @@ class Room(sge.dsp.Room):
             penalty = 0
 
         for i in range(max(1, TEAM_SIZE - max(self.score, 0, penalty))):
-            Ship.create(TEAM_GREEN)
+            ship_pool.spawn(TEAM_GREEN)
         for i in range(max(1, TEAM_SIZE + min(self.score, 0, penalty))):
-            Ship.create(TEAM_RED)
+            ship_pool.spawn(TEAM_RED)
 
-        if self.multiplayer:
+        if headless:
+            self.rounds += 1
+        elif self.multiplayer:
             self.views = [sge.dsp.View(0, 0, width=(VIEW_WIDTH / 2),
                                        height=VIEW_HEIGHT),
                           sge.dsp.View(ROOM_WIDTH, ROOM_HEIGHT,
@@ -565,45 +835,45 @@ class Room(sge.dsp.Room):
                                        width=(VIEW_WIDTH / 2),
                                        height=VIEW_HEIGHT)]
 
-            p1ship = random.choice(ships_lists[TEAM_GREEN])
-            player1 = Human.create(p1ship, 1,
-                                   key_thrust=player1_key_thrust,
-                                   key_left=player1_key_left,
-                                   key_right=player1_key_right,
-                                   key_shoot=player1_key_shoot,
-                                   js_thrust=player1_js_thrust,
-                                   js_left=player1_js_left,
-                                   js_right=player1_js_right,
-                                   js_shoot=player1_js_shoot)
+            p1ship = rng.choice(team_ships[TEAM_GREEN])
+            player1 = ship_pool.spawn_human(p1ship, 1,
+                                            key_thrust=player1_key_thrust,
+                                            key_left=player1_key_left,
+                                            key_right=player1_key_right,
+                                            key_shoot=player1_key_shoot,
+                                            js_thrust=player1_js_thrust,
+                                            js_left=player1_js_left,
+                                            js_right=player1_js_right,
+                                            js_shoot=player1_js_shoot)
             p1ship.controller.destroy()
             p1ship.controller = player1
 
-            p2ship = random.choice(ships_lists[TEAM_RED])
-            player2 = Human.create(p2ship, 0,
-                                   key_thrust=player2_key_thrust,
-                                   key_left=player2_key_left,
-                                   key_right=player2_key_right,
-                                   key_shoot=player2_key_shoot,
-                                   js_thrust=player2_js_thrust,
-                                   js_left=player2_js_left,
-                                   js_right=player2_js_right,
-                                   js_shoot=player2_js_shoot)
+            p2ship = rng.choice(team_ships[TEAM_RED])
+            player2 = ship_pool.spawn_human(p2ship, 0,
+                                            key_thrust=player2_key_thrust,
+                                            key_left=player2_key_left,
+                                            key_right=player2_key_right,
+                                            key_shoot=player2_key_shoot,
+                                            js_thrust=player2_js_thrust,
+                                            js_left=player2_js_left,
+                                            js_right=player2_js_right,
+                                            js_shoot=player2_js_shoot)
             p2ship.controller.destroy()
             p2ship.controller = player2
         else:
             self.views = [sge.dsp.View(ROOM_WIDTH, ROOM_HEIGHT,
                                        width=VIEW_WIDTH, height=VIEW_HEIGHT)]
 
-            p1ship = random.choice(ships_lists[TEAM_GREEN])
-            player1 = Human.create(p1ship, 0,
-                                   key_thrust=player1_key_thrust,
-                                   key_left=player1_key_left,
-                                   key_right=player1_key_right,
-                                   key_shoot=player1_key_shoot,
-                                   js_thrust=player1_js_thrust,
-                                   js_left=player1_js_left,
-                                   js_right=player1_js_right,
-                                   js_shoot=player1_js_shoot)
+            p1ship = rng.choice(team_ships[TEAM_GREEN])
+            player1 = ship_pool.spawn_human(p1ship, 0,
+                                            key_thrust=player1_key_thrust,
+                                            key_left=player1_key_left,
+                                            key_right=player1_key_right,
+                                            key_shoot=player1_key_shoot,
+                                            js_thrust=player1_js_thrust,
+                                            js_left=player1_js_left,
+                                            js_right=player1_js_right,
+                                            js_shoot=player1_js_shoot)
             p1ship.controller.destroy()
             p1ship.controller = player1
 
@@ -611,6 +881,9 @@ class Room(sge.dsp.Room):
         self.alarms["check_win"] = 5
 
     def round_end(self):
+        if memory_report is not None:
+            memory_report.sample(self, "round_end")
+
         if self.started:
             if self.score > 0:
                 self.round_counter -= 1
@@ -618,24 +891,50 @@ class Room(sge.dsp.Room):
                 self.round_counter += 1
 
             if abs(self.score) < points_to_win:
-                self.alarms["round_end"] = 90
+                self.alarms["round_end"] = 1 if headless else 90
             else:
                 self.finished = True
-                sge.snd.Music.stop(fade_time=5000)
+                if headless:
+                    self.record_result()
+                else:
+                    sge.snd.Music.stop(fade_time=5000)
         else:
             if self.score:
                 loser = TEAM_RED if self.score > 0 else TEAM_GREEN
                 self.score = 0
                 self.update_meter()
                 for i in range(TEAM_SIZE // 2):
-                    Ship.create(loser)
+                    ship_pool.spawn(loser)
             else:
                 for i in range(TEAM_SIZE // 2):
-                    Ship.create(TEAM_RED)
-                    Ship.create(TEAM_GREEN)
+                    ship_pool.spawn(TEAM_RED)
+                    ship_pool.spawn(TEAM_GREEN)
 
             self.alarms["check_win"] = 5
 
+    def record_result(self):
+        # Record the result of a finished headless match and either
+        # start the next match or end the game.
+        headless_results.append({
+            "match": len(headless_results) + 1,
+            "winner": "green" if self.score > 0 else "red",
+            "score": self.score,
+            "rounds": self.rounds,
+            "ticks": sge.game.ticks - self.start_ticks,
+            "bullet_pool": bullet_pool.stats(),
+            "ship_pool": ship_pool.stats()})
+        if seed is not None:
+            headless_results[-1]["seed"] = seed
+        if swept_collision is not None:
+            headless_results[-1]["collision"] = swept_collision.stats()
+        if ai_scheduler is not None:
+            headless_results[-1]["ai_scheduler"] = ai_scheduler.stats()
+
+        if len(headless_results) < headless_matches:
+            create_room().start()
+        else:
+            sge.game.end()
+
     def wait_key(self):
         # Wait for a key press and return it.
         key = None
@@ -723,28 +1022,57 @@ class Room(sge.dsp.Room):
 class Ship(sge.dsp.Object):
 
     def __init__(self, team):
-        super(Ship, self).__init__(random.randrange(*START_X_RANGE[team]),
-                                   random.randrange(*START_Y_RANGE[team]),
-                                   sprite=random.choice(ship_sprites[team]),
-                                   checks_collisions=False,
+        super(Ship, self).__init__(0, 0, checks_collisions=False,
                                    regulate_origin=True,
-                                   collision_precise=True,
-                                   image_rotation=random.randrange(360))
+                                   collision_precise=True, visible=False)
+        self.reset(team)
+
+    def reset(self, team):
+        # Place the ship at a random starting point of the team's side,
+        # either new or back from the ship pool for another round.
+        x = rng.randrange(*START_X_RANGE[team])
+        y = rng.randrange(*START_Y_RANGE[team])
+        i = rng.randrange(len(SHIP_BBOXES))
+        bbox_x, bbox_y, bbox_width, bbox_height = SHIP_BBOXES[i]
         self.team = team
+        self.sprite = ship_sprites[team][i]
+        self.bbox_x = bbox_x
+        self.bbox_y = bbox_y
+        self.bbox_width = bbox_width
+        self.bbox_height = bbox_height
+        self.x = x
+        self.y = y
+        self.xstart = x
+        self.ystart = y
+        self.xprevious = x
+        self.yprevious = y
+        self.xvelocity = 0
+        self.yvelocity = 0
+        self.xacceleration = 0
+        self.yacceleration = 0
+        self.image_rotation = rng.randrange(360)
+        self.alarms = {}
+        self.controller = None
+        self.pooled = False
 
     def event_create(self):
-        global ships_lists
-        self.controller = AI.create(self)
+        self.handle = team_ships[self.team].add(self)
+        self.controller = ship_pool.spawn_ai(self)
         self.thrust = False
         self.left = False
         self.right = False
         self.shoot = False
         self.can_shoot = True
         self.rvelocity = 0
-        self.thrust_obj = None
-        ships_lists[self.team].append(self)
+        self.on_screen = True
+        if physics is not None:
+            physics.add_ship(self)
 
     def event_update_position(self, delta_mult):
+        if physics is not None:
+            # Movement is handled by the physics engine.
+            return
+
         if delta_mult:
             vi = self.rvelocity
             a = (self.right - self.left) * TURN
@@ -765,6 +1093,41 @@ class Ship(sge.dsp.Object):
         if self.shoot:
             self.do_shoot()
 
+        if physics is None:
+            self.update_movement()
+
+    def event_end_step(self, time_passed, delta_mult):
+        # Ships are drawn here rather than by SGE, along with their
+        # exhaust, which is animated by the room's shared clock.  The
+        # views were gathered at the start of the step and may still
+        # follow the players this frame, hence the margin.
+        if rotation_atlas is not None:
+            on_screen = view_index.visible(
+                self.bbox_left - LOD_MARGIN, self.bbox_top - LOD_MARGIN,
+                self.bbox_right + LOD_MARGIN, self.bbox_bottom + LOD_MARGIN)
+            if on_screen != self.on_screen:
+                self.on_screen = on_screen
+                if on_screen and self.controller is not None:
+                    self.controller.wake()
+            if not on_screen:
+                return
+
+            sprite = exhaust_sprites.get(id(self.sprite))
+            if self.thrust and sprite is not None:
+                image = int(sge.game.current_room.animation_time *
+                            sprite.fps / 1000)
+                rotation_atlas.project(sprite, image, self.image_rotation,
+                                       self.x, self.y, self.z - 1)
+
+            rotation_atlas.project(self.sprite, 0, self.image_rotation,
+                                   self.x, self.y, self.z)
+
+            # Colorblind mode
+            if colorblind:
+                draw_batch.add(colorblind_sprites[self.team], 0,
+                               self.x - 8, self.y - 8, self.z + 1)
+
+    def update_movement(self):
         # Acceleration
         if self.thrust:
             direction = math.radians(self.image_rotation + 270)
@@ -792,93 +1155,61 @@ class Ship(sge.dsp.Object):
             self.bbox_bottom = ROOM_HEIGHT - (self.bbox_bottom - ROOM_HEIGHT)
             self.yvelocity = -abs(self.yvelocity)
 
-        # Colorblind mode
-        if colorblind:
-            sprite = colorblind_sprites[self.team]
-            sge.game.current_room.project_sprite(sprite, 0, self.x - 8,
-                                                 self.y - 8, self.z + 1)
-
-        # Display exhaust
-        if self.thrust:
-            if self.thrust_obj is None:
-                self.thrust_obj = sge.dsp.Object.create(
-                    self.x, self.y, -1,
-                    sprite=exhaust_sprites[id(self.sprite)], tangible=False,
-                    regulate_origin=True, image_xscale=self.image_xscale,
-                    image_yscale=self.image_yscale,
-                    image_rotation=self.image_rotation)
-            else:
-                self.thrust_obj.x = self.x
-                self.thrust_obj.y = self.y
-                self.thrust_obj.image_rotation = self.image_rotation
-        else:
-            if self.thrust_obj is not None:
-                self.thrust_obj.destroy()
-                self.thrust_obj = None
-
     def event_alarm(self, alarm_id):
         if alarm_id == "shoot":
             self.can_shoot = True
 
     def event_collision(self, other, xdirection, ydirection):
+        if collision_queue is not None and collision_queue.defer(self, other):
+            return
+
         if isinstance(other, Bullet) and other.team != self.team:
             self.destroy()
-            Explosion.create(self.x, self.y, self.z, sprite=explosion_sprite,
-                             regulate_origin=True)
-
-            in_range = False
-            for view in sge.game.current_room.views:
-                if (self.bbox_right >= view.x and
-                        self.bbox_left <= view.x + view.width and
-                        self.bbox_bottom >= view.y and
-                        self.bbox_top <= view.y + view.height):
-                    in_range = True
-                    break
 
-            if in_range:
-                explode_sound.play()
-            else:
-                explode_sound.play(volume=0.5)
+            if headless:
+                return
+
+            if explosion_sprite is not None:
+                Explosion.create(self.x, self.y, self.z,
+                                 sprite=explosion_sprite,
+                                 regulate_origin=True)
+
+            voices.request(explode_sound, self.x, self.y, floor=0.5)
 
     def event_destroy(self):
-        global ships_lists
-        while self in ships_lists[self.team]:
-            ships_lists[self.team].remove(self)
+        team_ships[self.team].remove(self.handle)
 
         if self.controller is not None:
             self.controller.destroy()
             self.controller = None
 
-        if self.thrust_obj is not None:
-            self.thrust_obj.destroy()
-            self.thrust_obj = None
+        spatial_grid.remove(self)
+        if physics is not None:
+            physics.remove_ship(self)
+
+        ship_pool.release(self)
 
     def do_shoot(self):
         if self.can_shoot:
-            bullet = Bullet.create(self.team, self.x, self.y, -5,
-                                   sprite=bullet_sprites[self.team],
-                                   collision_precise=True,
-                                   image_rotation=self.image_rotation)
-            bullet.speed = BULLET_SPEED
-            bullet.move_direction = bullet.image_rotation + 270
-            bullet.xvelocity += self.xvelocity
-            bullet.yvelocity += self.yvelocity
+            if physics is not None:
+                xvelocity, yvelocity = physics.ship_velocity(self)
+            else:
+                xvelocity = self.xvelocity
+                yvelocity = self.yvelocity
+
+            bullet = bullet_pool.spawn(self.team, self.x, self.y,
+                                       self.image_rotation, xvelocity,
+                                       yvelocity)
+            if physics is not None:
+                physics.add_bullet(bullet)
+
             self.can_shoot = False
             self.alarms["shoot"] = SHOOT_WAIT
 
-            in_range = False
-            for view in sge.game.current_room.views:
-                if (self.bbox_right >= view.x and
-                        self.bbox_left <= view.x + view.width and
-                        self.bbox_bottom >= view.y and
-                        self.bbox_top <= view.y + view.height):
-                    in_range = True
-                    break
+            if headless:
+                return
 
-            if in_range:
-                shoot_sound.play()
-            else:
-                shoot_sound.play(volume=0.5)
+            voices.request(shoot_sound, self.x, self.y, floor=0.25)
 
 
 class Explosion(sge.dsp.Object):
@@ -892,60 +1223,102 @@ class Bullet(sge.dsp.Object):
     def __init__(self, team, *args, **kwargs):
         super(Bullet, self).__init__(*args, **kwargs)
         self.team = team
+        self.pooled = False
+
+    def reset(self, team, x, y, rotation, xvelocity, yvelocity):
+        # Prepare a bullet from the pool to be fired again.
+        self.team = team
+        self.sprite = bullet_sprites[team]
+        self.x = x
+        self.y = y
+        self.xprevious = x
+        self.yprevious = y
+        self.image_rotation = rotation
+        self.xvelocity = xvelocity
+        self.yvelocity = yvelocity
+        self.alarms = {}
+        self.checks_collisions = swept_collision is None
+        self.pooled = False
 
     def event_create(self):
-        global bullets_lists
-        bullets_lists[self.team].append(self)
+        self.handle = team_bullets[self.team].add(self)
         self.alarms["death"] = BULLET_LIFE
 
     def event_destroy(self):
-        global bullets_list
-        while self in bullets_lists[self.team]:
-            bullets_lists[self.team].remove(self)
+        team_bullets[self.team].remove(self.handle)
+
+        spatial_grid.remove(self)
+        if physics is not None:
+            physics.remove_bullet(self)
+
+        bullet_pool.release(self)
+
+    def event_update_position(self, delta_mult):
+        if physics is None:
+            super(Bullet, self).event_update_position(delta_mult)
+
+    def event_end_step(self, time_passed, delta_mult):
+        if rotation_atlas is not None:
+            rotation_atlas.project(self.sprite, 0, self.image_rotation,
+                                   self.x, self.y, self.z)
 
     def event_alarm(self, alarm_id):
         if alarm_id == "death":
             self.destroy()
 
     def event_collision(self, other, xdirection, ydirection):
+        if collision_queue is not None and collision_queue.defer(self, other):
+            return
+
         if isinstance(other, Ship) and other.team != self.team:
             self.destroy()
         elif isinstance(other, Bullet):
             self.destroy()
 
-            in_range = False
-            for view in sge.game.current_room.views:
-                if (self.bbox_right >= view.x and
-                        self.bbox_left <= view.x + view.width and
-                        self.bbox_bottom >= view.y and
-                        self.bbox_top <= view.y + view.height):
-                    in_range = True
-                    break
+            if headless:
+                return
 
-            if in_range:
-                dissipate_sound.play()
+            voices.request(dissipate_sound, self.x, self.y)
 
 
 class Controller(sge.dsp.Object):
 
     def __init__(self, parent):
         super(Controller, self).__init__(0, 0, visible=False, tangible=False)
+        self.reset(parent)
+
+    def reset(self, parent):
         self.parent = parent
+        self.parent_handle = parent.handle
         self.team = parent.team
+        self.alarms = {}
+        self.pooled = False
 
     def event_destroy(self):
         self.parent = None
+        self.parent_handle = None
+
+    def parent_alive(self):
+        return team_ships[self.team].alive(self.parent_handle)
+
+    def wake(self):
+        # Called when the parent comes into sight of a view.
+        pass
 
 
 class Human(Controller):
 
-    def __init__(self, parent, view, key_thrust="up", key_left="left",
-                 key_right="right", key_shoot="space", js_thrust=None,
-                 js_left=None, js_right=None, js_shoot=None):
+    def __init__(self, parent, view, **controls):
         sge.dsp.Object.__init__(self, parent.x, parent.y, sprite=target_sprite,
-                                tangible=False)
-        self.parent = parent
-        self.team = parent.team
+                                visible=False, tangible=False)
+        self.reset(parent, view, **controls)
+
+    def reset(self, parent, view, key_thrust="up", key_left="left",
+              key_right="right", key_shoot="space", js_thrust=None,
+              js_left=None, js_right=None, js_shoot=None):
+        super(Human, self).reset(parent)
+        self.x = parent.x
+        self.y = parent.y
         self.view = view
         self.key_thrust = key_thrust
         self.key_left = key_left
@@ -991,20 +1364,19 @@ class Human(Controller):
         self.parent.shoot = self.parent.shoot or js_states[3]
 
     def event_end_step(self, time_passed, delta_mult):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             self.x = self.parent.x
             self.y = self.parent.y
             view = sge.game.current_room.views[self.view]
             view.x = self.parent.x - view.width / 2
             view.y = self.parent.y - view.height / 2
+            draw_batch.add(self.sprite, 0, self.x, self.y, self.z)
         else:
             print("Warning: Ship is dead but controller (a human) is not!")
             self.destroy()
 
     def event_key_press(self, key, char):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             if key == self.key_thrust:
                 self.parent.thrust = True
             if key == self.key_left:
@@ -1016,8 +1388,7 @@ class Human(Controller):
                 self.parent.do_shoot()
 
     def event_key_release(self, key):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             if key == self.key_thrust:
                 self.parent.thrust = False
             if key == self.key_left:
@@ -1028,8 +1399,7 @@ class Human(Controller):
                 self.parent.shoot = False
 
     def event_joystick_axis_move(self, js_name, js_id, axis, value):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             js_versions = [(js_id, "axis+", axis), (js_id, "axis-", axis)]
             if value > JOYSTICK_THRESHOLD:
                 js = (js_id, "axis+", axis)
@@ -1057,8 +1427,7 @@ class Human(Controller):
                 self.parent.shoot = False
 
     def event_joystick_hat_move(self, js_name, js_id, hat, x, y):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             js_versions = [(js_id, "hatx+", hat), (js_id, "hatx-", hat)]
             if x > 0:
                 js = (js_id, "hatx+", hat)
@@ -1112,8 +1481,7 @@ class Human(Controller):
                 self.parent.shoot = False
 
     def event_joystick_button_press(self, js_name, js_id, button):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             js = (js_id, "button", button)
 
             if js == self.js_thrust:
@@ -1127,8 +1495,7 @@ class Human(Controller):
                 self.parent.do_shoot()
 
     def event_joystick_button_release(self, js_name, js_id, button):
-        if (self.parent is not None and
-                self.parent in sge.game.current_room.objects):
+        if self.parent_alive():
             js = (js_id, "button", button)
 
             if js == self.js_thrust:
@@ -1146,35 +1513,35 @@ class Human(Controller):
 
         super(Human, self).event_destroy()
 
-        friends = ships_lists[self.team]
+        friends = team_ships[self.team]
         if friends:
-            ship = random.choice(friends)
+            ship = rng.choice(friends)
 
             if ship.controller is not None:
                 ship.controller.destroy()
                 ship.controller = None
 
             if self is player1:
-                player1 = Human.create(ship, self.view,
-                                       key_thrust=player1_key_thrust,
-                                       key_left=player1_key_left,
-                                       key_right=player1_key_right,
-                                       key_shoot=player1_key_shoot,
-                                       js_thrust=player1_js_thrust,
-                                       js_left=player1_js_left,
-                                       js_right=player1_js_right,
-                                       js_shoot=player1_js_shoot)
+                player1 = ship_pool.spawn_human(ship, self.view,
+                                                key_thrust=player1_key_thrust,
+                                                key_left=player1_key_left,
+                                                key_right=player1_key_right,
+                                                key_shoot=player1_key_shoot,
+                                                js_thrust=player1_js_thrust,
+                                                js_left=player1_js_left,
+                                                js_right=player1_js_right,
+                                                js_shoot=player1_js_shoot)
                 ship.controller = player1
             elif self is player2:
-                player2 = Human.create(ship, self.view,
-                                       key_thrust=player2_key_thrust,
-                                       key_left=player2_key_left,
-                                       key_right=player2_key_right,
-                                       key_shoot=player2_key_shoot,
-                                       js_thrust=player2_js_thrust,
-                                       js_left=player2_js_left,
-                                       js_right=player2_js_right,
-                                       js_shoot=player2_js_shoot)
+                player2 = ship_pool.spawn_human(ship, self.view,
+                                                key_thrust=player2_key_thrust,
+                                                key_left=player2_key_left,
+                                                key_right=player2_key_right,
+                                                key_shoot=player2_key_shoot,
+                                                js_thrust=player2_js_thrust,
+                                                js_left=player2_js_left,
+                                                js_right=player2_js_right,
+                                                js_shoot=player2_js_shoot)
                 ship.controller = player2
         else:
             if self is player1:
@@ -1182,17 +1549,61 @@ class Human(Controller):
             elif self is player2:
                 player2 = None
 
+        ship_pool.release(self)
+
 
 class AI(Controller):
 
     def event_create(self):
         self.target = None
         self.threats = []
-        self.alarms["select_target"] = random.randint(30, 90)
-        self.alarms["check_threats"] = 5
+        if ai_scheduler is not None:
+            ai_scheduler.add(self)
+        else:
+            self.alarms["select_target"] = rng.randint(30, 90)
+            self.alarms["check_threats"] = 5
+
+        if ai_batches is not None:
+            # Decisions and alarms are handled by the team's BatchedAI.
+            self.active = False
+            ai_batches[self.team].add(self)
+        else:
+            # Seeded runs step the AI from the room; see update.
+            self.active = seed is None
+
+    def event_destroy(self):
+        if ai_batches is not None:
+            ai_batches[self.team].remove(self)
+        if ai_scheduler is not None:
+            ai_scheduler.remove(self)
+
+        super(AI, self).event_destroy()
+        ship_pool.release(self)
+
+    def wake(self):
+        # Bring alarms set while out of sight back within their normal
+        # range, so the AI is not left on a slow plan once it is seen.
+        if ai_scheduler is not None:
+            ai_scheduler.expedite(self, "select_target", 180)
+            ai_scheduler.expedite(self, "check_threats", 10)
+        elif ai_batches is not None:
+            ai_batches[self.team].wake(self)
+        else:
+            for alarm_id, limit in [("select_target", 180),
+                                    ("check_threats", 10)]:
+                if self.alarms.get(alarm_id, 0) > limit:
+                    self.alarms[alarm_id] = limit
+
+    def slowdown(self):
+        # Off-screen AIs rethink less often, except in seeded runs,
+        # where what the views happen to show must not change the
+        # outcome.
+        if seed is None and not headless and not self.parent.on_screen:
+            return LOD_AI_SLOWDOWN
+        return 1
 
     def event_step(self, time_passed, delta_mult):
-        if self.parent in sge.game.current_room.objects:
+        if self.parent_alive():
             # Release all buttons
             self.parent.thrust = False
             self.parent.left = False
@@ -1257,13 +1668,15 @@ class AI(Controller):
                     # Resort to just shooting.
                     self.parent.do_shoot()
             elif self.target is not None:
-                if self.target in sge.game.current_room.objects:
+                et = TEAM_GREEN if self.team == TEAM_RED else TEAM_RED
+                target = team_ships[et].get(self.target)
+                if target is not None:
                     # Persue target
-                    dist = math.hypot(self.target.x - self.parent.x,
-                                      self.target.y - self.parent.y)
+                    dist = math.hypot(target.x - self.parent.x,
+                                      target.y - self.parent.y)
                     target_angle = math.degrees(
-                        math.atan2(self.target.y - self.parent.y,
-                                   self.target.x - self.parent.x))
+                        math.atan2(target.y - self.parent.y,
+                                   target.x - self.parent.x))
                     diff = (target_angle -
                             (self.parent.image_rotation + 270)) % 360
                     if 2 < diff < 180:
@@ -1276,53 +1689,1716 @@ class AI(Controller):
                             self.parent.thrust = True
                         else:
                             self.parent.do_shoot()
+                elif ai_scheduler is not None:
+                    ai_scheduler.expedite(self, "select_target", 10)
                 elif self.alarms.get("select_target", 15) > 10:
                     self.alarms["select_target"] = 10
 
+    def update(self, time_passed, delta_mult):
+        # Count down the alarms and step, as SGE does for active objects.
+        due = []
+        for alarm_id in self.alarms:
+            self.alarms[alarm_id] -= delta_mult
+            if self.alarms[alarm_id] <= 0:
+                due.append(alarm_id)
+        for alarm_id in due:
+            del self.alarms[alarm_id]
+            self.event_alarm(alarm_id)
+
+        self.event_step(time_passed, delta_mult)
+
     def event_alarm(self, alarm_id):
-        if self.parent in sge.game.current_room.objects:
-            et = TEAM_GREEN if self.team == TEAM_RED else TEAM_RED
+        if self.parent_alive():
             if alarm_id == "select_target":
-                self.target = None
+                self.select_target()
+                self.alarms["select_target"] = (rng.randint(90, 180) *
+                                                self.slowdown())
+            elif alarm_id == "check_threats":
+                self.check_threats()
+                self.alarms["check_threats"] = (rng.randint(5, 10) *
+                                                self.slowdown())
 
-                for ship in ships_lists[et]:
-                    if (self.target is None or
-                             (math.hypot(ship.x - self.parent.x,
-                                         ship.y - self.parent.y) <
-                              math.hypot(self.target.x - self.parent.x,
-                                         self.target.y - self.parent.y))):
-                        self.target = ship
+    def select_target(self):
+        et = TEAM_GREEN if self.team == TEAM_RED else TEAM_RED
+        target = spatial_grid.nearest_ship(et, self.parent.x, self.parent.y)
+        self.target = target.handle if target is not None else None
 
-                self.alarms["select_target"] = random.randint(90, 180)
-            elif alarm_id == "check_threats":
-                self.threats = []
-                potential_threats = ships_lists[et] + bullets_lists[et]
-                for pt in potential_threats:
-                    dist = math.hypot(pt.x - self.parent.x,
-                                      pt.y - self.parent.y)
-                    direction = (pt.image_rotation + 270) % 360
-                    pt_direction = math.degrees(math.atan2(
-                        self.parent.y - pt.y, self.parent.x - pt.x)) % 360
-                    diff = abs(pt_direction - direction)
-                    if (dist <= DANGER_DISTANCE and
-                            diff <= DANGER_ANGLE):
-                        self.threats.append(pt)
-                self.alarms["check_threats"] = random.randint(5, 10)
-
-
-def create_nebula(num, z, scroll_rate):
-    # Create a nebula background layer and return it.
-    sprite = sge.gfx.Sprite(width=max(ROOM_WIDTH, ROOM_WIDTH * scroll_rate),
-                            height=max(ROOM_HEIGHT, ROOM_HEIGHT * scroll_rate))
-    layers = []
-    for i in range(num):
-        nebula_sprite = random.choice(nebula_sprites)
-        x = random.randrange(max(1, int(sprite.width - nebula_sprite.width)))
-        y = random.randrange(max(1, int(sprite.height - nebula_sprite.height)))
-        sprite.draw_sprite(nebula_sprite, 0, x, y)
+    def check_threats(self):
+        et = TEAM_GREEN if self.team == TEAM_RED else TEAM_RED
+        self.threats = []
+        potential_threats = spatial_grid.nearby(
+            et, self.parent.x, self.parent.y, DANGER_DISTANCE)
+        for pt in potential_threats:
+            dist = math.hypot(pt.x - self.parent.x, pt.y - self.parent.y)
+            direction = (pt.image_rotation + 270) % 360
+            pt_direction = math.degrees(math.atan2(
+                self.parent.y - pt.y, self.parent.x - pt.x)) % 360
+            diff = abs(pt_direction - direction)
+            if dist <= DANGER_DISTANCE and diff <= DANGER_ANGLE:
+                self.threats.append(pt)
+
+
+class BulletPool:
+
+    # Free list of dormant Bullet objects.  Shooting reactivates one of
+    # these instead of constructing a new Bullet, and destroyed bullets
+    # are returned here.  The pool grows as needed, and at the start of
+    # each round it is trimmed back to the most bullets that were live
+    # at once during the last round.  It is kept across rooms, and
+    # bullets left over from the previous room are returned to it when
+    # the next room starts.
+
+    def __init__(self):
+        self.free = []
+        self.size = 0
+        self.live = 0
+        self.high_water = 0
+        self.round_high_water = 0
+
+    def allocate(self):
+        bbox_x, bbox_y, bbox_width, bbox_height = BULLET_BBOX
+        bullet = Bullet(TEAM_RED, 0, 0, -5, sprite=bullet_sprites[TEAM_RED],
+                        bbox_x=bbox_x, bbox_y=bbox_y, bbox_width=bbox_width,
+                        bbox_height=bbox_height, collision_precise=True,
+                        visible=False)
+        bullet.pooled = True
+        return bullet
+
+    def trim(self):
+        keep = max(self.round_high_water - self.live, 0)
+        if len(self.free) > keep:
+            self.size -= len(self.free) - keep
+            del self.free[keep:]
+        self.round_high_water = self.live
+
+    def spawn(self, team, x, y, rotation, xvelocity, yvelocity):
+        # Fire a bullet in the direction of rotation, adding the given
+        # velocity to BULLET_SPEED.
+        if self.free:
+            bullet = self.free.pop()
+        else:
+            bullet = self.allocate()
+            self.size += 1
+
+        direction = math.radians(rotation + 270)
+        bullet.reset(team, x, y, rotation,
+                     math.cos(direction) * BULLET_SPEED + xvelocity,
+                     math.sin(direction) * BULLET_SPEED + yvelocity)
+        self.live += 1
+        self.high_water = max(self.high_water, self.live)
+        self.round_high_water = max(self.round_high_water, self.live)
+        sge.game.current_room.add(bullet)
+        return bullet
+
+    def release(self, bullet):
+        # Bullets can be destroyed more than once in a frame, e.g. when
+        # hitting a ship and another bullet at the same time.
+        if not bullet.pooled:
+            bullet.pooled = True
+            self.live -= 1
+            self.free.append(bullet)
+
+    def stats(self):
+        return {"size": self.size, "free": len(self.free), "live": self.live,
+                "high_water": self.high_water}
+
+
+class ShipPool:
+
+    # Dormant Ship, AI and Human objects.  Ships destroyed in battle or
+    # cleared away at the start of a round are returned here along with
+    # their controllers, and are reset in place for the next fleet
+    # instead of constructing it anew.  Like the bullet pool, it is kept
+    # across rooms.
+
+    def __init__(self):
+        self.ships = []
+        self.ais = []
+        self.humans = []
+        self.created = 0
+        self.reused = 0
+
+    def spawn(self, team):
+        # Place a ship for team at a random starting point.
+        if self.ships:
+            ship = self.ships.pop()
+            ship.reset(team)
+            self.reused += 1
+        else:
+            ship = Ship(team)
+            self.created += 1
+
+        sge.game.current_room.add(ship)
+        return ship
+
+    def spawn_ai(self, ship):
+        if self.ais:
+            ai = self.ais.pop()
+            ai.reset(ship)
+            self.reused += 1
+        else:
+            ai = AI(ship)
+            self.created += 1
+
+        sge.game.current_room.add(ai)
+        return ai
+
+    def spawn_human(self, ship, view, **controls):
+        if self.humans:
+            human = self.humans.pop()
+            human.reset(ship, view, **controls)
+            self.reused += 1
+        else:
+            human = Human(ship, view, **controls)
+            self.created += 1
+
+        sge.game.current_room.add(human)
+        return human
+
+    def release(self, obj):
+        # Objects can be destroyed more than once, e.g. a ship hit by
+        # two bullets in the same frame.
+        if not obj.pooled:
+            obj.pooled = True
+            if isinstance(obj, Ship):
+                self.ships.append(obj)
+            elif isinstance(obj, AI):
+                self.ais.append(obj)
+            elif isinstance(obj, Human):
+                self.humans.append(obj)
+            else:
+                raise TypeError("cannot pool {}".format(
+                    type(obj).__name__))
+
+    def stats(self):
+        return {"created": self.created, "reused": self.reused,
+                "free": len(self.ships) + len(self.ais) + len(self.humans)}
+
+
+class SpatialGrid:
+
+    # Uniform grid over the room which buckets the ships and bullets of
+    # each team by position.  It is rebuilt once per frame so that AI
+    # queries only need to look at the cells near the ship asking.
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.ships = {TEAM_RED: {}, TEAM_GREEN: {}}
+        self.bullets = {TEAM_RED: {}, TEAM_GREEN: {}}
+        self.bounds = {TEAM_RED: None, TEAM_GREEN: None}
+        self.locations = {}
+
+    def rebuild(self):
+        self.locations = {}
+        for team in [TEAM_RED, TEAM_GREEN]:
+            self.ships[team] = self.bucket(team_ships[team])
+            self.bullets[team] = self.bucket(team_bullets[team])
+
+            if self.ships[team]:
+                columns = [i for i, j in self.ships[team]]
+                rows = [j for i, j in self.ships[team]]
+                self.bounds[team] = (min(columns), min(rows), max(columns),
+                                     max(rows))
+            else:
+                self.bounds[team] = None
+
+    def bucket(self, objects):
+        cells = {}
+        size = self.cell_size
+        for obj in objects:
+            key = (int(obj.x // size), int(obj.y // size))
+            cells.setdefault(key, []).append(obj)
+            self.locations[obj] = (cells, key)
+
+        return cells
+
+    def remove(self, obj):
+        # Remove an object that has been destroyed since the last
+        # rebuild.
+        location = self.locations.pop(obj, None)
+        if location is not None:
+            cells, key = location
+            cell = cells[key]
+            cell.remove(obj)
+            if not cell:
+                del cells[key]
+
+    def nearest_ship(self, team, x, y):
+        # Return the ship of the given team which is closest to (x, y),
+        # or None if the team has no ships.
+        bounds = self.bounds[team]
+        cells = self.ships[team]
+        if bounds is None or not cells:
+            return None
+
+        size = self.cell_size
+        ci = int(x // size)
+        cj = int(y // size)
+        min_i, min_j, max_i, max_j = bounds
+        rings = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj, 0)
+
+        nearest = None
+        nearest_dist = math.inf
+        for ring in range(rings + 1):
+            # Nothing in this ring can be closer than (ring - 1) cells.
+            if (ring - 1) * size >= nearest_dist:
+                break
+
+            for i in range(ci - ring, ci + ring + 1):
+                if ring and ci - ring < i < ci + ring:
+                    js = [cj - ring, cj + ring]
+                else:
+                    js = range(cj - ring, cj + ring + 1)
+
+                for j in js:
+                    for ship in cells.get((i, j), ()):
+                        dist = math.hypot(ship.x - x, ship.y - y)
+                        if dist < nearest_dist:
+                            nearest = ship
+                            nearest_dist = dist
+
+        return nearest
+
+    def nearby(self, team, x, y, radius):
+        # Return the ships and bullets of the given team in all cells
+        # within radius of (x, y).
+        size = self.cell_size
+        ships = self.ships[team]
+        bullets = self.bullets[team]
+        objects = []
+        for i in range(int((x - radius) // size),
+                       int((x + radius) // size) + 1):
+            for j in range(int((y - radius) // size),
+                           int((y + radius) // size) + 1):
+                objects.extend(ships.get((i, j), ()))
+                objects.extend(bullets.get((i, j), ()))
+
+        return objects
+
+
+class SweptCollision:
+
+    # Analytic replacement for SGE's pixel-mask collision of bullets.
+    # Ships and bullets are treated as circles, and each bullet's motion
+    # over the frame is swept against the motion of everything near it,
+    # so fast bullets can't tunnel through small ships.  Bullets are
+    # then created with checks_collisions disabled, leaving SGE with
+    # nothing to check.  Without the physics engine, the motion swept
+    # is the one SGE is about to make at the end of the frame; with it,
+    # it is the one the engine has just made, traced back from where
+    # everything is now.
+
+    def __init__(self):
+        self.pairs = 0
+        self.hits = 0
+
+    def velocity(self, obj):
+        if physics is not None and isinstance(obj, Ship):
+            return physics.ship_velocity(obj)
+        else:
+            return obj.xvelocity, obj.yvelocity
+
+    def radius(self, obj):
+        if isinstance(obj, Ship):
+            return min(obj.bbox_width, obj.bbox_height) / 2
+        else:
+            return BULLET_RADIUS
+
+    def contact_time(self, x, y, dx, dy, radius):
+        # Return the fraction of the frame at which a circle starting at
+        # (x, y) relative to another and moving by (dx, dy) relative to
+        # it first comes within radius, or None if it doesn't.
+        c = x * x + y * y - radius * radius
+        if c <= 0:
+            return 0
+
+        a = dx * dx + dy * dy
+        b = 2 * (x * dx + y * dy)
+        if a == 0 or b >= 0:
+            return None
+
+        disc = b * b - 4 * a * c
+        if disc < 0:
+            return None
+
+        t = (-b - math.sqrt(disc)) / (2 * a)
+        return t if t <= 1 else None
+
+    def step(self, delta_mult):
+        # Anything a bullet can touch this frame is within this distance
+        # of it, since both it and the other object move at most
+        # BULLET_SPEED + THRUST_MAX.
+        reach = (2 * (BULLET_SPEED + THRUST_MAX) * delta_mult +
+                 BULLET_RADIUS + max(b[2] for b in SHIP_BBOXES) / 2)
+        moved = physics is not None
+
+        for team in [TEAM_RED, TEAM_GREEN]:
+            et = TEAM_GREEN if team == TEAM_RED else TEAM_RED
+            for bullet in list(team_bullets[team]):
+                if not team_bullets[team].alive(bullet.handle):
+                    continue
+
+                # Friendly ships can't be hit, so they are dropped before
+                # any geometry is looked at.
+                candidates = [
+                    obj for obj in spatial_grid.nearby(team, bullet.x,
+                                                       bullet.y, reach)
+                    if isinstance(obj, Bullet) and obj is not bullet]
+                candidates.extend(spatial_grid.nearby(et, bullet.x, bullet.y,
+                                                      reach))
+
+                xvelocity, yvelocity = self.velocity(bullet)
+                first = None
+                first_t = None
+                for other in candidates:
+                    registry = (team_ships if isinstance(other, Ship)
+                                else team_bullets)
+                    if not registry[other.team].alive(other.handle):
+                        continue
+
+                    self.pairs += 1
+                    other_xv, other_yv = self.velocity(other)
+                    dx = (xvelocity - other_xv) * delta_mult
+                    dy = (yvelocity - other_yv) * delta_mult
+                    x = bullet.x - other.x
+                    y = bullet.y - other.y
+                    if moved:
+                        x -= dx
+                        y -= dy
+                    t = self.contact_time(x, y, dx, dy,
+                                          BULLET_RADIUS + self.radius(other))
+                    if t is not None and (first_t is None or t < first_t):
+                        first = other
+                        first_t = t
+
+                if first is not None:
+                    self.hits += 1
+                    first.event_collision(bullet, 0, 0)
+                    bullet.event_collision(first, 0, 0)
+
+    def stats(self):
+        return {"pairs": self.pairs, "hits": self.hits}
+
+
+class CollisionQueue:
+
+    # In seeded runs, the collisions SGE detects are only recorded here,
+    # since SGE finds them in an order that depends on object ids.  They
+    # are resolved at the start of the next frame, before anything has
+    # moved, in the order the objects were registered.  As with swept
+    # collision, each pair is resolved once and only if both objects
+    # are still alive by then.
+
+    def __init__(self):
+        self.pairs = {}
+        self.resolving = False
+
+    def alive(self, obj):
+        registry = team_ships if isinstance(obj, Ship) else team_bullets
+        return registry[obj.team].alive(obj.handle)
+
+    def defer(self, obj, other):
+        # Record a collision reported by SGE, returning whether it is to
+        # be handled later rather than now.
+        if self.resolving:
+            return False
+
+        if isinstance(other, (Ship, Bullet)):
+            if other.handle < obj.handle:
+                obj, other = other, obj
+            self.pairs[(obj.handle, other.handle)] = (obj, other)
+        return True
+
+    def resolve(self):
+        pairs = self.pairs
+        self.pairs = {}
+        self.resolving = True
+        try:
+            for key in sorted(pairs):
+                obj, other = pairs[key]
+                if self.alive(obj) and self.alive(other):
+                    obj.event_collision(other, 0, 0)
+                    other.event_collision(obj, 0, 0)
+        finally:
+            self.resolving = False
+
+
+class EntityArrays:
+
+    # A set of entities stored as one row of contiguous NumPy arrays
+    # per entity.  Removing an entity moves the last row into its slot,
+    # so the first len(objects) rows are always the live ones.
+
+    def __init__(self, fields, capacity=64):
+        self.objects = []
+        self.slots = {}
+        self.arrays = {field: numpy.zeros(capacity) for field in fields}
+
+    def add(self, obj, **values):
+        if obj in self.slots:
+            return
+
+        i = len(self.objects)
+        if i >= len(self.arrays[next(iter(self.arrays))]):
+            for field, array in self.arrays.items():
+                self.arrays[field] = numpy.concatenate(
+                    [array, numpy.zeros(len(array))])
+
+        self.objects.append(obj)
+        self.slots[obj] = i
+        for field, value in values.items():
+            self.arrays[field][i] = value
+
+    def remove(self, obj):
+        i = self.slots.pop(obj, None)
+        if i is None:
+            return
+
+        last = len(self.objects) - 1
+        if i != last:
+            moved = self.objects[last]
+            self.objects[i] = moved
+            self.slots[moved] = i
+            for array in self.arrays.values():
+                array[i] = array[last]
+
+        self.objects.pop()
+
+    def get(self, obj, field):
+        return float(self.arrays[field][self.slots[obj]])
+
+    def view(self, field):
+        return self.arrays[field][:len(self.objects)]
+
+
+class PhysicsEngine:
+
+    # Moves all ships and bullets in one vectorized pass per frame.
+    # This replaces Ship.event_update_position, the movement part of
+    # Ship.event_step, and the default movement of bullets.
+
+    def __init__(self):
+        self.ships = EntityArrays(["x", "y", "xvelocity", "yvelocity",
+                                   "xacceleration", "yacceleration",
+                                   "rotation", "rvelocity", "bbox_x",
+                                   "bbox_y", "bbox_width", "bbox_height"])
+        self.bullets = EntityArrays(["x", "y", "xvelocity", "yvelocity"])
+
+    def add_ship(self, ship):
+        self.ships.add(ship, x=ship.x, y=ship.y, xvelocity=ship.xvelocity,
+                       yvelocity=ship.yvelocity, rotation=ship.image_rotation,
+                       rvelocity=ship.rvelocity, bbox_x=ship.bbox_x,
+                       bbox_y=ship.bbox_y, bbox_width=ship.bbox_width,
+                       bbox_height=ship.bbox_height)
+
+    def remove_ship(self, ship):
+        self.ships.remove(ship)
+
+    def add_bullet(self, bullet):
+        self.bullets.add(bullet, x=bullet.x, y=bullet.y,
+                         xvelocity=bullet.xvelocity,
+                         yvelocity=bullet.yvelocity)
+
+    def remove_bullet(self, bullet):
+        self.bullets.remove(bullet)
+
+    def ship_velocity(self, ship):
+        return (self.ships.get(ship, "xvelocity"),
+                self.ships.get(ship, "yvelocity"))
+
+    def step(self, delta_mult):
+        self.step_ships(delta_mult)
+        self.step_bullets(delta_mult)
+
+    def step_ships(self, delta_mult):
+        objects = self.ships.objects
+        n = len(objects)
+        if not n:
+            return
+
+        x = self.ships.view("x")
+        y = self.ships.view("y")
+        xv = self.ships.view("xvelocity")
+        yv = self.ships.view("yvelocity")
+        xa = self.ships.view("xacceleration")
+        ya = self.ships.view("yacceleration")
+        rotation = self.ships.view("rotation")
+        rv = self.ships.view("rvelocity")
+        bbox_x = self.ships.view("bbox_x")
+        bbox_y = self.ships.view("bbox_y")
+        bbox_w = self.ships.view("bbox_width")
+        bbox_h = self.ships.view("bbox_height")
+
+        thrust = numpy.fromiter((ship.thrust for ship in objects), bool, n)
+        turn = numpy.fromiter((ship.right - ship.left for ship in objects),
+                              float, n)
+
+        if delta_mult:
+            # Rotation
+            vi = rv.copy()
+            a = turn * TURN
+            rv += a * delta_mult
+            sign = numpy.sign(rv)
+            slowing = numpy.abs(rv) > TURN_FRICTION * delta_mult
+            a = numpy.where(slowing, a - TURN_FRICTION * sign,
+                            a - rv / delta_mult)
+            rv[:] = numpy.where(slowing, rv - TURN_FRICTION * delta_mult * sign,
+                                0)
+            rotation += vi * delta_mult + 0.5 * a * (delta_mult ** 2)
+
+            # Movement
+            vi = xv.copy()
+            xv += xa * delta_mult
+            x += ((vi + xv) / 2) * delta_mult
+            vi = yv.copy()
+            yv += ya * delta_mult
+            y += ((vi + yv) / 2) * delta_mult
+
+        # Acceleration
+        direction = numpy.radians(rotation + 270)
+        xa[:] = numpy.where(thrust, numpy.cos(direction) * THRUST, 0)
+        ya[:] = numpy.where(thrust, numpy.sin(direction) * THRUST, 0)
+
+        speed = numpy.hypot(xv, yv)
+        factor = THRUST_MAX / numpy.maximum(speed, THRUST_MAX)
+        xv *= factor
+        yv *= factor
+        numpy.clip(rv, -TURN_MAX, TURN_MAX, out=rv)
+
+        # Bounce off edges
+        left = x + bbox_x
+        right = left + bbox_w
+        hit_left = left < 0
+        hit_right = ~hit_left & (right > ROOM_WIDTH)
+        x[hit_left] = -left[hit_left] - bbox_x[hit_left]
+        xv[hit_left] = numpy.abs(xv[hit_left])
+        x[hit_right] = (2 * ROOM_WIDTH - right[hit_right] - bbox_w[hit_right] -
+                        bbox_x[hit_right])
+        xv[hit_right] = -numpy.abs(xv[hit_right])
+
+        top = y + bbox_y
+        bottom = top + bbox_h
+        hit_top = top < 0
+        hit_bottom = ~hit_top & (bottom > ROOM_HEIGHT)
+        y[hit_top] = -top[hit_top] - bbox_y[hit_top]
+        yv[hit_top] = numpy.abs(yv[hit_top])
+        y[hit_bottom] = (2 * ROOM_HEIGHT - bottom[hit_bottom] -
+                         bbox_h[hit_bottom] - bbox_y[hit_bottom])
+        yv[hit_bottom] = -numpy.abs(yv[hit_bottom])
+
+        for ship, sx, sy, srotation in zip(objects, x.tolist(), y.tolist(),
+                                           rotation.tolist()):
+            ship.x = sx
+            ship.y = sy
+            ship.image_rotation = srotation
+
+    def step_bullets(self, delta_mult):
+        objects = self.bullets.objects
+        if not objects or not delta_mult:
+            return
+
+        x = self.bullets.view("x")
+        y = self.bullets.view("y")
+        x += self.bullets.view("xvelocity") * delta_mult
+        y += self.bullets.view("yvelocity") * delta_mult
+
+        for bullet, bx, by in zip(objects, x.tolist(), y.tolist()):
+            bullet.x = bx
+            bullet.y = by
+
+
+class BatchedAI:
+
+    # Makes the decisions of every AI on a team in one vectorized pass
+    # per frame, with the same pursue and evade rules as AI.event_step.
+    # The AI objects themselves are inactive; their alarms are counted
+    # down here and still handled by AI.event_alarm.
 
-    return sge.gfx.BackgroundLayer(sprite, 0, 0, z, xscroll_rate=scroll_rate,
-                                   yscroll_rate=scroll_rate)
+    def __init__(self, team):
+        self.team = team
+        self.enemy_team = TEAM_GREEN if team == TEAM_RED else TEAM_RED
+        self.ais = EntityArrays(["select_target", "check_threats"])
+
+    def add(self, ai):
+        # With the AI scheduler, the alarms are never set, so they are
+        # never due here either.
+        self.ais.add(ai,
+                     select_target=ai.alarms.pop("select_target", math.inf),
+                     check_threats=ai.alarms.pop("check_threats", math.inf))
+
+    def remove(self, ai):
+        self.ais.remove(ai)
+
+    def wake(self, ai):
+        i = self.ais.slots.get(ai)
+        if i is not None:
+            for alarm_id, limit in [("select_target", 180),
+                                    ("check_threats", 10)]:
+                alarms = self.ais.arrays[alarm_id]
+                alarms[i] = min(alarms[i], limit)
+
+    def step(self, delta_mult):
+        self.update_alarms(delta_mult)
+
+        ais = self.ais.objects
+        n = len(ais)
+        if not n:
+            return
+
+        ships = [ai.parent for ai in ais]
+        x = numpy.fromiter((ship.x for ship in ships), float, n)
+        y = numpy.fromiter((ship.y for ship in ships), float, n)
+        rotation = numpy.fromiter((ship.image_rotation for ship in ships),
+                                  float, n)
+        direction = (rotation + 270) % 360
+        evading = numpy.fromiter((bool(ai.threats) for ai in ais), bool, n)
+
+        thrust = numpy.zeros(n, bool)
+        left = numpy.zeros(n, bool)
+        right = numpy.zeros(n, bool)
+        shoot = numpy.zeros(n, bool)
+
+        if evading.any():
+            # Get to safety
+            room = sge.game.current_room
+            thrust_ok = numpy.ones(n, bool)
+            left_ok = numpy.ones(n, bool)
+            right_ok = numpy.ones(n, bool)
+
+            wall = x <= DANGER_DISTANCE
+            right_ok &= ~(wall & (90 < direction) & (direction < 180))
+            left_ok &= ~(wall & (180 < direction) & (direction < 270))
+            wall = ~wall & (x >= room.width - DANGER_DISTANCE)
+            left_ok &= ~(wall & (0 < direction) & (direction < 90))
+            right_ok &= ~(wall & (270 < direction) & (direction > 360))
+
+            wall = y <= DANGER_DISTANCE
+            right_ok &= ~(wall & (0 < direction) & (direction < 90))
+            left_ok &= ~(wall & (90 < direction) & (direction < 180))
+            wall = ~wall & (y >= room.height - DANGER_DISTANCE)
+            right_ok &= ~(wall & (180 < direction) & (direction < 270))
+            left_ok &= ~(wall & (270 < direction) & (direction < 360))
+
+            owners = []
+            threat_x = []
+            threat_y = []
+            for i, ai in enumerate(ais):
+                for threat in ai.threats:
+                    owners.append(i)
+                    threat_x.append(threat.x)
+                    threat_y.append(threat.y)
+
+            owners = numpy.array(owners, int)
+            threat_direction = numpy.degrees(numpy.arctan2(
+                numpy.array(threat_y) - y[owners],
+                numpy.array(threat_x) - x[owners]))
+            diff = (threat_direction - direction[owners]) % 360
+            ahead = (diff <= DANGER_ANGLE) | (diff >= 360 - DANGER_ANGLE)
+            on_right = ~ahead & (DANGER_ANGLE < diff) & (
+                diff <= 2 * DANGER_ANGLE)
+            on_left = ~ahead & (360 - 2 * DANGER_ANGLE <= diff) & (
+                diff < 360 - DANGER_ANGLE)
+            ahead = numpy.bincount(owners, ahead, n) > 0
+            thrust_ok &= ~ahead
+            right_ok &= ~(numpy.bincount(owners, on_right, n) > 0)
+            left_ok &= ~(numpy.bincount(owners, on_left, n) > 0)
+
+            thrust |= evading & thrust_ok
+            left |= evading & left_ok
+            right |= evading & ~left_ok & right_ok
+            shoot |= evading & (ahead | (~left_ok & ~right_ok))
+
+        # Pursue targets
+        enemies = team_ships[self.enemy_team]
+        targets = [enemies.get(ai.target) for ai in ais]
+        pursuing = ~evading & numpy.fromiter(
+            (target is not None for target in targets), bool, n)
+        lost = ~evading & ~pursuing & numpy.fromiter(
+            (ai.target is not None for ai in ais), bool, n)
+
+        if pursuing.any():
+            target_x = numpy.fromiter(
+                (target.x if target is not None else 0 for target in targets),
+                float, n)
+            target_y = numpy.fromiter(
+                (target.y if target is not None else 0 for target in targets),
+                float, n)
+            dist = numpy.hypot(target_x - x, target_y - y)
+            target_angle = numpy.degrees(numpy.arctan2(target_y - y,
+                                                       target_x - x))
+            diff = (target_angle - (rotation + 270)) % 360
+            right |= pursuing & (2 < diff) & (diff < 180)
+            left |= pursuing & (180 <= diff) & (diff < 358)
+            aligned = pursuing & ((diff <= 10) | (diff >= 350))
+            far = dist > BULLET_SPEED * BULLET_LIFE
+            thrust |= aligned & far
+            shoot |= aligned & ~far
+
+        if lost.any():
+            if ai_scheduler is not None:
+                for i in numpy.flatnonzero(lost).tolist():
+                    ai_scheduler.expedite(ais[i], "select_target", 10)
+            else:
+                select_target = self.ais.view("select_target")
+                select_target[lost & (select_target > 10)] = 10
+
+        for ship, ship_thrust, ship_left, ship_right in zip(
+                ships, thrust.tolist(), left.tolist(), right.tolist()):
+            ship.thrust = ship_thrust
+            ship.left = ship_left
+            ship.right = ship_right
+            ship.shoot = False
+
+        for i in numpy.flatnonzero(shoot).tolist():
+            ships[i].do_shoot()
+
+    def update_alarms(self, delta_mult):
+        ais = self.ais.objects
+        for alarm_id in ["select_target", "check_threats"]:
+            alarms = self.ais.view(alarm_id)
+            alarms -= delta_mult
+            for i in numpy.flatnonzero(alarms <= 0).tolist():
+                ai = ais[i]
+                ai.event_alarm(alarm_id)
+                alarms[i] = ai.alarms.pop(alarm_id, math.inf)
+
+
+class AIScheduler:
+
+    # Replaces the AIs' own select_target and check_threats alarms with
+    # one queue per kind of decision.  Each decision is scheduled for
+    # the least busy tick within its usual range, so AIs created
+    # together don't all decide on the same ticks.  Every tick, due
+    # threat checks are made before due retargeting, until the tick's
+    # budget runs out; whatever is left waits for the next tick, in
+    # order, and counts as late.  At least one decision is made per
+    # tick, whatever the budget.
+
+    KINDS = ["check_threats", "select_target"]
+
+    def __init__(self, budget=AI_BUDGET):
+        self.budget = budget
+        self.tick = 0
+        self.queues = {kind: [] for kind in self.KINDS}
+        self.entries = {}
+        self.load = {}
+        self.order = itertools.count()
+        self.jobs = 0
+        self.late = 0
+        self.max_jobs = 0
+        self.max_lateness = 0
+
+    def add(self, ai):
+        self.schedule(ai, "select_target", 30, 90)
+        self.schedule(ai, "check_threats", 1, 10)
+
+    def remove(self, ai):
+        for kind in self.KINDS:
+            self.remove_entry(ai, kind)
+
+    def remove_entry(self, ai, kind):
+        entry = self.entries.pop((ai, kind), None)
+        if entry is not None:
+            self.unload(entry[0])
+
+    def unload(self, tick):
+        n = self.load.get(tick, 0) - 1
+        if n > 0:
+            self.load[tick] = n
+        else:
+            self.load.pop(tick, None)
+
+    def schedule(self, ai, kind, earliest, latest):
+        # Schedule a decision for the least busy tick between earliest
+        # and latest ticks from now, replacing any already scheduled.
+        self.remove_entry(ai, kind)
+        load = self.load
+        due = self.tick + earliest
+        busy = load.get(due, 0)
+        for tick in range(due + 1, self.tick + latest + 1):
+            n = load.get(tick, 0)
+            if n < busy:
+                due = tick
+                busy = n
+                if not n:
+                    break
+
+        entry = (due, next(self.order), ai)
+        self.entries[(ai, kind)] = entry
+        load[due] = busy + 1
+        heapq.heappush(self.queues[kind], entry)
+
+    def expedite(self, ai, kind, latest):
+        # Make sure a decision is made within latest ticks from now.
+        entry = self.entries.get((ai, kind))
+        if entry is not None and entry[0] > self.tick + latest:
+            self.schedule(ai, kind, 1, latest)
+
+    def step(self):
+        self.tick += 1
+        perf_counter = time.perf_counter
+        deadline = perf_counter() + self.budget
+        if seed is not None:
+            limit = max(1, int(self.budget / AI_JOB_COST))
+        else:
+            limit = None
+
+        jobs = 0
+        for kind in self.KINDS:
+            queue = self.queues[kind]
+            while queue and queue[0][0] <= self.tick:
+                if jobs and (perf_counter() >= deadline if limit is None
+                             else jobs >= limit):
+                    break
+
+                entry = heapq.heappop(queue)
+                ai = entry[2]
+                if self.entries.get((ai, kind)) is not entry:
+                    # Replaced or removed since it was scheduled
+                    continue
+
+                del self.entries[(ai, kind)]
+                self.unload(entry[0])
+                if not ai.parent_alive():
+                    continue
+
+                jobs += 1
+                lateness = self.tick - entry[0]
+                if lateness:
+                    self.late += 1
+                    self.max_lateness = max(self.max_lateness, lateness)
+
+                if kind == "check_threats":
+                    ai.check_threats()
+                    self.schedule(ai, kind, 5 * ai.slowdown(),
+                                  10 * ai.slowdown())
+                else:
+                    ai.select_target()
+                    self.schedule(ai, kind, 90 * ai.slowdown(),
+                                  180 * ai.slowdown())
+
+        self.jobs += jobs
+        self.max_jobs = max(self.max_jobs, jobs)
+
+    def stats(self):
+        return {"ticks": self.tick, "jobs": self.jobs, "late": self.late,
+                "max_jobs": self.max_jobs,
+                "max_lateness": self.max_lateness}
+
+
+class ViewIndex:
+
+    # The rectangles of the current room's views, gathered at the start
+    # of the room's step and again once the views have followed the
+    # players, so that anything deciding whether it can be seen or heard
+    # asks this instead of looping over the views itself.  Most things
+    # are outside of every view, so they are first checked against the
+    # smallest rectangle around all of them.
+
+    def __init__(self):
+        self.rects = []
+        self.centres = []
+        self.bounds = None
+
+    def update(self, room):
+        self.rects = [(view.x, view.y, view.x + view.width,
+                       view.y + view.height) for view in room.views]
+        self.centres = [((left + right) / 2, (top + bottom) / 2)
+                        for left, top, right, bottom in self.rects]
+        if self.rects:
+            self.bounds = (min(rect[0] for rect in self.rects),
+                           min(rect[1] for rect in self.rects),
+                           max(rect[2] for rect in self.rects),
+                           max(rect[3] for rect in self.rects))
+        else:
+            self.bounds = None
+
+    def visible(self, left, top, right, bottom):
+        # Return whether the given bounding box overlaps any view.
+        bounds = self.bounds
+        if (bounds is None or right < bounds[0] or left > bounds[2] or
+                bottom < bounds[1] or top > bounds[3]):
+            return False
+        if len(self.rects) == 1:
+            return True
+
+        for view_left, view_top, view_right, view_bottom in self.rects:
+            if (right >= view_left and left <= view_right and
+                    bottom >= view_top and top <= view_bottom):
+                return True
+
+        return False
+
+    def distance_to_views(self, x, y):
+        # Return the distance from the given point to the nearest view,
+        # which is 0 inside of one, or None if there are no views.
+        distance = None
+        for left, top, right, bottom in self.rects:
+            d = math.hypot(max(left - x, 0, x - right),
+                           max(top - y, 0, y - bottom))
+            if distance is None or d < distance:
+                distance = d
+
+        return distance
+
+    def distance_to_centres(self, x, y):
+        # Return the distance from the given point to the nearest view
+        # centre, or None if there are no views.
+        distance = None
+        for cx, cy in self.centres:
+            d = math.hypot(x - cx, y - cy)
+            if distance is None or d < distance:
+                distance = d
+
+        return distance
+
+
+class DrawBatch:
+
+    # Everything drawn by the game itself rather than by SGE's objects
+    # (ships, bullets, exhaust, colorblind markers and the players'
+    # target reticles) is gathered here during the frame and projected
+    # in one pass just before the screen is refreshed.  By then all
+    # objects have moved and the players' views have followed them, so
+    # anything outside of every view can be skipped.
+
+    def __init__(self):
+        self.sprites = []
+
+    def add(self, sprite, image, x, y, z):
+        self.sprites.append((sprite, image, x, y, z))
+
+    def flush(self):
+        room = sge.game.current_room
+        visible = view_index.visible
+        for sprite, image, x, y, z in self.sprites:
+            left = x - sprite.origin_x
+            top = y - sprite.origin_y
+            if visible(left, top, left + sprite.width, top + sprite.height):
+                room.project_sprite(sprite, image, x, y, z)
+
+        del self.sprites[:]
+
+
+class VoiceManager:
+
+    # Battle sounds are requested here with the position they come from
+    # instead of being played right away.  Once per frame, requests for
+    # the same sound are ranked by distance to the nearest view centre,
+    # requests close to a nearer one are merged into it, and only as
+    # many are played as the sound has free voices.  A sound inside a
+    # view plays at full volume; outside of every view, its volume
+    # fades from full to its floor (or to nothing) over VOICE_FALLOFF.
+
+    def __init__(self):
+        self.requests = {}
+
+    def request(self, sound, x, y, floor=0):
+        self.requests.setdefault(sound, []).append((x, y, floor))
+
+    def flush(self):
+        if not self.requests:
+            return
+
+        for sound, requests in self.requests.items():
+            ranked = []
+            for x, y, floor in requests:
+                edge = view_index.distance_to_views(x, y) or 0
+                fade = max(0, 1 - edge / VOICE_FALLOFF)
+                volume = floor + (1 - floor) * fade
+                if volume > 0:
+                    centre = view_index.distance_to_centres(x, y) or 0
+                    ranked.append((centre, x, y, volume))
+
+            # Requests beyond what can be played only matter for
+            # making a nearer one louder.
+            free = (sound.max_play or 0) - sound.playing
+            limit = max(free, 1)
+            ranked.sort()
+            voices = []
+            for centre, x, y, volume in ranked:
+                for i, (vx, vy, v) in enumerate(voices):
+                    if (abs(x - vx) <= VOICE_MERGE_DISTANCE and
+                            abs(y - vy) <= VOICE_MERGE_DISTANCE):
+                        voices[i] = (vx, vy, max(v, volume))
+                        break
+                else:
+                    if len(voices) < limit:
+                        voices.append((x, y, volume))
+
+            # The nearest sound in a view is always heard, even if that
+            # means cutting off one already playing.
+            for i, (x, y, volume) in enumerate(voices):
+                if i < free:
+                    sound.play(volume=volume, force=False)
+                elif i == 0 and volume >= 1:
+                    sound.play(volume=volume)
+                else:
+                    break
+
+        self.requests.clear()
+
+
+class RotationAtlas:
+
+    # Copies of sprites pre-rotated to a fixed number of angles, made
+    # the first time each one is needed.  SGE caches rotated images by
+    # their exact angle, so ships turning by fractions of a degree
+    # every frame would otherwise be re-rotated every time they are
+    # drawn.  The atlas holds at most one copy per sprite and step; if
+    # it ever grows past its budget, the copies used least recently are
+    # dropped, so the angles being drawn right now stay.
+
+    def __init__(self, steps, budget=ROTATION_ATLAS_BUDGET):
+        self.steps = steps
+        self.budget = budget
+        self.sprites = collections.OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def size(sprite):
+        return sprite.width * sprite.height * sprite.frames * 4
+
+    def get(self, sprite, rotation):
+        step = round(rotation * self.steps / 360) % self.steps
+        key = (sprite, step)
+        rotated = self.sprites.get(key)
+        if rotated is not None:
+            self.sprites.move_to_end(key)
+            return rotated
+
+        rotated = self.rotate(sprite, step * 360 / self.steps)
+        self.bytes += self.size(rotated)
+        while self.bytes > self.budget and self.sprites:
+            old_key, old = self.sprites.popitem(last=False)
+            self.bytes -= self.size(old)
+            self.evictions += 1
+        self.sprites[key] = rotated
+        return rotated
+
+    def project(self, sprite, image, rotation, x, y, z):
+        # Draw a frame of sprite rotated by rotation this frame.
+        draw_batch.add(self.get(sprite, rotation), image, x, y, z)
+
+    def rotate(self, sprite, angle):
+        # Return a copy of sprite rotated by angle, with its origin
+        # moved the same way SGE moves the origin of an object with
+        # regulate_origin enabled.
+        rotated = sprite.copy()
+        rotated.rotate(angle)
+        x = sprite.origin_x - sprite.width / 2
+        y = sprite.origin_y - sprite.height / 2
+        a = math.radians(angle)
+        rotated.origin_x = (rotated.width / 2 + x * math.cos(a) -
+                            y * math.sin(a))
+        rotated.origin_y = (rotated.height / 2 + x * math.sin(a) +
+                            y * math.cos(a))
+        return rotated
+
+    def stats(self):
+        return {"steps": self.steps, "images": len(self.sprites),
+                "bytes": self.bytes, "evictions": self.evictions}
+
+
+class Profiler:
+
+    # Times and counts calls to the main event handlers, frame by frame.
+    # While disabled, the handlers are the plain methods, so profiling
+    # costs nothing; enabling it swaps timing wrappers into the classes
+    # and disabling it puts the original methods back.  Time is counted
+    # exclusively: when a profiled handler calls another one (e.g. the
+    # room's step runs the physics engine), the inner call's time goes
+    # to the inner handler only.  The totals of the last frame can be
+    # drawn as an overlay, and the last TRACE_FRAMES profiled frames
+    # are kept for export as a Chrome trace (chrome://tracing).
+
+    TRACE_FRAMES = 30 * 60 * 10
+
+    EVENTS = [("Room", "event_step"), ("Ship", "event_step"),
+              ("Ship", "event_update_position"), ("Ship", "event_collision"),
+              ("Bullet", "event_collision"), ("AI", "event_step"),
+              ("AI", "event_alarm"), ("BatchedAI", "step"),
+              ("AIScheduler", "step"),
+              ("PhysicsEngine", "step"), ("SweptCollision", "step")]
+
+    def __init__(self, trace_path=None):
+        self.enabled = False
+        self.originals = {}
+        self.names = ["{}.{}".format(*event) for event in self.EVENTS]
+        self.times = dict.fromkeys(self.names, 0)
+        self.calls = dict.fromkeys(self.names, 0)
+        self.last_times = self.times.copy()
+        self.last_calls = self.calls.copy()
+        self.trace_path = trace_path
+        self.trace = collections.deque(maxlen=self.TRACE_FRAMES)
+        self.stack = []
+        self.epoch = time.perf_counter()
+        self.frame_start = None
+
+    def wrap(self, name, function):
+        times = self.times
+        calls = self.calls
+        stack = self.stack
+        perf_counter = time.perf_counter
+
+        def profiled(*args, **kwargs):
+            # Each stack entry holds the time spent in nested calls
+            stack.append(0)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                times[name] += elapsed - stack.pop()
+                calls[name] += 1
+                if stack:
+                    stack[-1] += elapsed
+
+        return profiled
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.frame_start = None
+            for (cls_name, method), name in zip(self.EVENTS, self.names):
+                cls = globals()[cls_name]
+                self.originals[name] = cls.__dict__[method]
+                setattr(cls, method, self.wrap(name, self.originals[name]))
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for (cls_name, method), name in zip(self.EVENTS, self.names):
+                setattr(globals()[cls_name], method, self.originals[name])
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def end_frame(self):
+        # Called once at the start of every frame while enabled; closes
+        # the previous frame and starts collecting the next one.
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            ts = (self.frame_start - self.epoch) * 1000000
+            events = [{"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                       "ts": ts, "dur": (now - self.frame_start) * 1000000}]
+            for name in self.names:
+                if self.calls[name]:
+                    events.append({
+                        "name": name, "ph": "C", "pid": 1, "ts": ts,
+                        "args": {"ms": self.times[name] * 1000,
+                                 "calls": self.calls[name]}})
+            self.trace.append(events)
+
+        self.last_times = self.times.copy()
+        self.last_calls = self.calls.copy()
+        for name in self.names:
+            self.times[name] = 0
+            self.calls[name] = 0
+        self.frame_start = now
+
+    def overlay_text(self):
+        lines = []
+        for name in sorted(self.names, key=self.last_times.get,
+                           reverse=True):
+            if self.last_calls[name]:
+                lines.append("{:.2f} ms {:>5} {}".format(
+                    self.last_times[name] * 1000, self.last_calls[name],
+                    name))
+
+        if rotation_atlas is not None:
+            lines.append("Rotation atlas: {} images, {:.1f} MiB".format(
+                len(rotation_atlas.sprites), rotation_atlas.bytes / 1048576))
+
+        return "\n".join(lines)
+
+    def save_trace(self):
+        with open(self.trace_path, 'w') as f:
+            json.dump({"traceEvents": [event for events in self.trace
+                                       for event in events],
+                       "displayTimeUnit": "ms"}, f)
+
+
+class MemoryReport:
+
+    # Memory used by the game's own structures, itemized and sampled at
+    # every round boundary.  Each sample is appended to a file as one
+    # JSON object per line.  Images are counted by the size of their
+    # pixel buffers and grouped by what they are for.  Sounds are
+    # counted by the size of their decoded samples, and live objects by
+    # class with their shallow size.  Images that share another image's
+    # pixels, such as frames cut out of the texture atlas, are counted
+    # once.
+
+    def __init__(self, path):
+        self.path = path
+        self.samples = 0
+
+    @staticmethod
+    def resident_memory():
+        # Return the resident set size of the process in bytes, or None
+        # if the system doesn't say.
+        try:
+            with open("/proc/self/statm", 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def surface_bytes(surface):
+        if surface.get_parent() is not None:
+            return 0
+        return surface.get_pitch() * surface.get_height()
+
+    def sprite_bytes(self, sprites, seen):
+        # Return the total size of the frames of sprites, leaving out
+        # any sprite in seen and adding the others to it.
+        total = 0
+        for sprite in sprites:
+            if sprite is not None and id(sprite) not in seen:
+                seen.add(id(sprite))
+                for image in sprite.rd["baseimages"]:
+                    total += self.surface_bytes(image)
+
+        return total
+
+    def images(self, room):
+        # Return the size of the game's images by what they are for.
+        # The nebula tiles are counted before the background as a whole,
+        # so that "background" is what is left: the stars.
+        categories = [
+            ("ships", ship_sprites[TEAM_RED] + ship_sprites[TEAM_GREEN]),
+            ("exhaust", list(exhaust_sprites.values())),
+            ("explosion", [explosion_sprite]),
+            ("bullets", list(bullet_sprites.values())),
+            ("markers", list(colorblind_sprites.values()) + [target_sprite]),
+            ("logo", [logo_sprite]),
+            ("meter", [meter_left_sprite, meter_right_sprite,
+                       meter_center_sprite, meter_back_sprite, meter_sprite] +
+             list(meter_sprites.values()) + list(meter_cache.values())),
+            ("menu", [getattr(room, "menu_sprite", None), pause_sprite]),
+            ("fonts", [menu_font.rd["font"].sprite,
+                       selection_font.rd["font"].sprite]),
+            ("nebula pieces", [nebula[0] for nebula in nebula_sprites]),
+            ("nebula tiles", [layer.sprite for nebula in nebulae
+                              for layer in nebula.layers.values()]),
+            ("background", [layer.sprite for layer in background.layers])]
+        if rotation_atlas is not None:
+            categories.append(("rotation atlas",
+                               list(rotation_atlas.sprites.values())))
+
+        seen = set()
+        sizes = {name: self.sprite_bytes(sprites, seen)
+                 for name, sprites in categories}
+        if texture_atlas:
+            sizes["texture atlas"] = self.surface_bytes(texture_atlas[0])
+
+        # Converted, scaled and rotated copies kept by SGE for drawing
+        cached = [value for value in sge.r.cache._cache.values()
+                  if isinstance(value, pygame.Surface)]
+        sizes["SGE image cache"] = sum(self.surface_bytes(image)
+                                       for image in cached)
+        return sizes
+
+    @staticmethod
+    def audio():
+        # Return the size of each sound's decoded samples.  The music
+        # is streamed from its file, so it has none.
+        mixer = pygame.mixer.get_init()
+        sizes = {}
+        for name, sound in [("shoot", shoot_sound), ("explode", explode_sound),
+                            ("dissipate", dissipate_sound),
+                            ("select", select_sound)]:
+            if mixer is None:
+                sizes[name] = 0
+            else:
+                frequency, size, channels = mixer
+                sizes[name] = int(sound.length / 1000 * frequency *
+                                  channels * abs(size) // 8)
+
+        return sizes
+
+    @staticmethod
+    def objects(room):
+        # Return the number and shallow size of the room's objects and
+        # of the objects waiting in the pools, by class.
+        counts = {}
+        pooled = []
+        if bullet_pool is not None:
+            pooled.extend(bullet_pool.free)
+        if ship_pool is not None:
+            pooled.extend(ship_pool.ships + ship_pool.ais + ship_pool.humans)
+        for prefix, objects in [("", room.objects), ("pooled ", pooled)]:
+            for obj in objects:
+                key = prefix + type(obj).__name__
+                count, size = counts.get(key, (0, 0))
+                counts[key] = (count + 1, size + sys.getsizeof(obj) +
+                               sys.getsizeof(obj.__dict__))
+
+        return {key: {"count": count, "bytes": size}
+                for key, (count, size) in counts.items()}
+
+    def sample(self, room, event):
+        # Append a sample taken at the given round event to the file.
+        record = {"sample": self.samples, "time": round(time.time(), 3),
+                  "event": event, "score": room.score,
+                  "resident": self.resident_memory(),
+                  "objects": self.objects(room)}
+        if not headless:
+            record["images"] = self.images(room)
+            record["audio"] = self.audio()
+
+        other = {}
+        if physics is not None:
+            other["physics arrays"] = sum(
+                array.nbytes for entities in [physics.ships, physics.bullets]
+                for array in entities.arrays.values())
+        if ai_batches is not None:
+            other["AI batch arrays"] = sum(
+                array.nbytes for batch in ai_batches.values()
+                for array in batch.ais.arrays.values())
+        if bullet_pool is not None:
+            other["bullet pool"] = bullet_pool.stats()
+        if asset_cache is not None and asset_cache.data is not None:
+            other["asset cache mapping"] = len(asset_cache.data)
+        if profiler is not None:
+            other["profiler trace frames"] = len(profiler.trace)
+        record["other"] = other
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        self.samples += 1
+
+
+class AssetLoader:
+
+    # Assets which aren't needed to show the menu.  They are loaded one
+    # per frame while the menu is up; until then, the menu's battle goes
+    # on without them.  Whatever is left is loaded all at once when a
+    # game starts.
+
+    def __init__(self):
+        self.queue = []
+
+    def add(self, function):
+        self.queue.append(function)
+
+    def step(self):
+        # Load the next asset, and save anything new to the asset cache
+        # once there is nothing left to load.
+        if self.queue:
+            self.queue.pop(0)()
+            if not self.queue and asset_cache is not None:
+                asset_cache.save()
+
+    def finish(self):
+        while self.queue:
+            self.step()
+
+
+class AssetCache:
+
+    # Images loaded from DATA_IMAGES, and images made from them, kept
+    # on disk between runs as raw RGBA pixels.  The cache file is mapped
+    # into memory and cached images are made straight from it, so a
+    # warm start decodes no image files at all.  The whole cache is
+    # thrown away if the game version, the file format or any of the
+    # image files have changed.
+
+    def __init__(self, path):
+        self.path = path
+        self.source_hash = self.hash_sources()
+        self.entries = {}
+        self.new = {}
+        self.changed = False
+        self.data = None
+
+        try:
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            # No cache yet (or an empty file, which can't be mapped)
+            return
+
+        try:
+            header, start = self.read_header(data)
+        except (ValueError, struct.error):
+            header = None
+
+        if (header is not None and
+                header.get("format") == ASSET_CACHE_FORMAT and
+                header.get("version") == __version__ and
+                header.get("source_hash") == self.source_hash):
+            self.data = data
+            self.start = start
+            self.entries = header["entries"]
+        else:
+            data.close()
+
+    @staticmethod
+    def hash_sources():
+        # Return a hash of the names and contents of all image files.
+        h = hashlib.sha1()
+        for fname in sorted(os.listdir(DATA_IMAGES)):
+            path = os.path.join(DATA_IMAGES, fname)
+            if os.path.isfile(path):
+                h.update(fname.encode("utf-8") + b"\0")
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+
+        return h.hexdigest()
+
+    @staticmethod
+    def read_header(data):
+        # Return the header of the cache file mapped as data and the
+        # position where its pixel data starts.
+        pos = len(ASSET_CACHE_MAGIC)
+        if data[:pos] != ASSET_CACHE_MAGIC:
+            raise ValueError("not an asset cache")
+        length, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        header = json.loads(data[pos:pos + length].decode("utf-8"))
+        return header, AssetCache.align(pos + length, ASSET_CACHE_ALIGN)
+
+    @staticmethod
+    def align(pos, alignment):
+        return -(-pos // alignment) * alignment
+
+    def get(self, key):
+        # Return the images stored under key and the extra information
+        # that was stored with them, or None if there are none.
+        if key in self.new:
+            return self.new[key]
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        view = memoryview(self.data)
+        images = []
+        for offset, width, height in entry["frames"]:
+            start = self.start + offset
+            images.append(pygame.image.frombuffer(
+                view[start:start + width * height * 4], (width, height),
+                "RGBA"))
+
+        return images, entry["info"]
+
+    def put(self, key, images, info=None):
+        # Store images under key, to be written out by save.
+        self.new[key] = (list(images), info)
+        self.changed = True
+
+    def save(self):
+        # Write the cache file again if anything was added to it.
+        if not self.changed:
+            return
+
+        entries = {}
+        chunks = []
+        offset = 0
+        keys = sorted(set(self.entries) | set(self.new))
+        for key in keys:
+            images, info = self.get(key)
+            frames = []
+            for image in images:
+                width, height = image.get_size()
+                frames.append((offset, width, height))
+                chunk = pygame.image.tostring(image, "RGBA")
+                padding = self.align(len(chunk), 16) - len(chunk)
+                chunks.append(chunk + b"\0" * padding)
+                offset += len(chunk) + padding
+            entries[key] = {"frames": frames, "info": info}
+
+        header = json.dumps({"format": ASSET_CACHE_FORMAT,
+                             "version": __version__,
+                             "source_hash": self.source_hash,
+                             "entries": entries}).encode("utf-8")
+        head = ASSET_CACHE_MAGIC + struct.pack("<I", len(header)) + header
+        head += b"\0" * (self.align(len(head), ASSET_CACHE_ALIGN) - len(head))
+
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(head)
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            warnings.warn("Could not save the asset cache: {}".format(e))
+        else:
+            self.changed = False
+
+
+def cut_nebula(sprite):
+    # Cut a nebula sprite into square pieces the size of a background
+    # tile and return them as the frames of a new sprite, along with
+    # the size of the whole nebula and how many pieces make up each row.
+    size = NEBULA_TILE_SIZE
+    columns = int(math.ceil(sprite.width / size))
+    rows = int(math.ceil(sprite.height / size))
+    pieces = sge.gfx.Sprite(width=size, height=size)
+    for i in range(1, columns * rows):
+        pieces.append_frame()
+    for i in range(columns * rows):
+        x = (i % columns) * size
+        y = (i // columns) * size
+        pieces.draw_sprite(sprite, 0, -x, -y, frame=i)
+
+    return (pieces, sprite.width, sprite.height, columns)
+
+
+class NebulaLayer:
+
+    # A background layer of nebulae scattered at random, cut into
+    # square tiles.  Only the tiles that some nebula overlaps exist at
+    # all, and their images are only drawn as they come near a view;
+    # tiles that go well out of sight are thrown away again.  Where the
+    # nebulae go is decided by the layer's seed alone, so a tile can
+    # always be drawn again exactly as it was.
+
+    def __init__(self, num, z, scroll_rate, seed):
+        self.z = z
+        self.scroll_rate = scroll_rate
+        self.seed = seed
+        self.layers = {}
+        self.shown = set()
+
+        # The nebulae overlapping each tile, in the order they are drawn
+        self.tiles = {}
+        width = max(ROOM_WIDTH, ROOM_WIDTH * scroll_rate)
+        height = max(ROOM_HEIGHT, ROOM_HEIGHT * scroll_rate)
+        r = random.Random(seed)
+        for i in range(num):
+            nebula = r.choice(nebula_sprites)
+            nebula_w, nebula_h = nebula[1:3]
+            x = r.randrange(max(1, int(width - nebula_w)))
+            y = r.randrange(max(1, int(height - nebula_h)))
+            for key in self.tiles_in(x, y, x + nebula_w - 1, y + nebula_h - 1,
+                                     True):
+                self.tiles.setdefault(key, []).append((nebula, x, y))
+
+    def tiles_in(self, left, top, right, bottom, all_tiles=False):
+        # Yield the keys of the tiles overlapping the given rectangle
+        # which have any nebula in them, or of all of them if all_tiles
+        # is true.
+        size = NEBULA_TILE_SIZE
+        for tx in range(int(left // size), int(right // size) + 1):
+            for ty in range(int(top // size), int(bottom // size) + 1):
+                if all_tiles or (tx, ty) in self.tiles:
+                    yield (tx, ty)
+
+    def create_tile(self, key):
+        # Draw the tile with the given key and return its background
+        # layer.  Only the pieces of each nebula which overlap the tile
+        # are drawn onto it.
+        size = NEBULA_TILE_SIZE
+        left = key[0] * size
+        top = key[1] * size
+        sprite = sge.gfx.Sprite(width=size, height=size)
+        for nebula, x, y in self.tiles[key]:
+            pieces, nebula_w, nebula_h, columns = nebula
+            rows = pieces.frames // columns
+            for column in range(max(0, (left - x) // size),
+                                min(columns, (left + size - x) // size + 1)):
+                for row in range(max(0, (top - y) // size),
+                                 min(rows, (top + size - y) // size + 1)):
+                    sprite.draw_sprite(pieces, row * columns + column,
+                                       x + column * size - left,
+                                       y + row * size - top)
+
+        return sge.gfx.BackgroundLayer(sprite, left, top, self.z,
+                                       xscroll_rate=self.scroll_rate,
+                                       yscroll_rate=self.scroll_rate)
+
+    def update(self, room):
+        # Show the tiles in sight of the room's views as part of its
+        # background.  Tiles that go out of sight are hidden, and are
+        # only thrown away once they are more than a tile out of sight.
+        size = NEBULA_TILE_SIZE
+        wanted = set()
+        kept = set()
+        for view_left, view_top, view_right, view_bottom in view_index.rects:
+            left = (view_left - room.background_x) * self.scroll_rate
+            top = (view_top - room.background_y) * self.scroll_rate
+            right = left + view_right - view_left - 1
+            bottom = top + view_bottom - view_top - 1
+            wanted.update(self.tiles_in(left, top, right, bottom))
+            kept.update(self.tiles_in(left - size, top - size, right + size,
+                                      bottom + size))
+
+        layers = room.background.layers
+        for key in self.shown - wanted:
+            layers.remove(self.layers[key])
+        for key in wanted - self.shown:
+            if key not in self.layers:
+                self.layers[key] = self.create_tile(key)
+            layers.append(self.layers[key])
+        self.shown = wanted
+
+        for key in list(self.layers):
+            if key not in kept:
+                del self.layers[key]
+
+        # Rather than drawing a whole row of tiles on the frame they
+        # come into sight, draw one of the nearby tiles ahead of time
+        # each frame.
+        for key in kept:
+            if key not in self.layers:
+                self.layers[key] = self.create_tile(key)
+                break
+
+
+def create_meter(score, points, show_colorblind):
+    # Draw the score meter for the given score and points to win.
+    w = meter_back_sprite.width
+    h = meter_back_sprite.height
+    meter_w = (meter_left_sprite.width + meter_right_sprite.width +
+               meter_center_sprite.width + w * points * 2)
+    meter = sge.gfx.Sprite(width=meter_w, height=16)
+
+    green_meter = sge.gfx.Sprite(width=(w * points), height=h)
+    red_meter = sge.gfx.Sprite(width=green_meter.width, height=h)
+
+    green_meter.draw_lock()
+    red_meter.draw_lock()
+
+    for i in range(points):
+        green_meter.draw_sprite(meter_back_sprite, 0, w * i, 0)
+        red_meter.draw_sprite(meter_back_sprite, 0, w * i, 0)
+
+    if score > 0:
+        for i in range(score):
+            x = w * i
+            green_meter.draw_sprite(meter_sprites[TEAM_GREEN], 0, x, 0)
+            if show_colorblind:
+                green_meter.draw_sprite(colorblind_sprites[TEAM_GREEN], 0,
+                                        x + w / 2 - 8, 0)
+    elif score < 0:
+        for i in range(abs(score)):
+            x = red_meter.width - w * i
+            red_meter.draw_sprite(meter_sprites[TEAM_RED], 0, x, 0)
+            if show_colorblind:
+                red_meter.draw_sprite(colorblind_sprites[TEAM_RED], 0,
+                                      x - w / 2 - 8, 0)
+
+    green_meter.draw_unlock()
+    red_meter.draw_unlock()
+
+    x = 0
+    meter.draw_lock()
+    for sprite in [meter_left_sprite, red_meter, meter_center_sprite,
+                   green_meter, meter_right_sprite]:
+        meter.draw_sprite(sprite, 0, x, 0)
+        x += sprite.width
+    meter.draw_unlock()
+
+    return meter
 
 
 def create_room():
@@ -1334,193 +3410,627 @@ def create_room():
                 object_area_height=64)
 
 
+def sprite_from_images(images, **kwargs):
+    # Return a sprite with the given surfaces as its frames, scaled to
+    # the width and height given, if any.  SGE can only make sprites
+    # from image files, so the frames are swapped into a blank sprite of
+    # the same size.
+    width = kwargs.pop("width", images[0].get_width())
+    height = kwargs.pop("height", images[0].get_height())
+    sprite = sge.gfx.Sprite(width=images[0].get_width(),
+                            height=images[0].get_height(), **kwargs)
+    sprite.rd["baseimages"] = list(images)
+    sprite.size = (width, height)
+    return sprite
+
+
+def load_from_atlas(name):
+    # Return the frames of the named sprite cut out of the texture atlas
+    # and its origin, or None if the sprite isn't in the atlas or there
+    # is no atlas.  The atlas is loaded the first time it is needed, so
+    # it isn't decoded at all when everything is in the asset cache.
+    global texture_atlas
+
+    if texture_atlas is None:
+        start = time.perf_counter()
+        try:
+            with open(ATLAS_INDEX, 'r') as f:
+                index = json.load(f)
+            image = pygame.image.load(ATLAS_IMAGE).convert_alpha()
+        except FileNotFoundError:
+            texture_atlas = False
+        except (OSError, ValueError, pygame.error) as e:
+            texture_atlas = False
+            warnings.warn("Could not load the texture atlas: {}".format(e))
+        else:
+            texture_atlas = (image, index)
+            add_startup_phase("texture atlas", start)
+
+    if not texture_atlas or name not in texture_atlas[1]:
+        return None
+
+    image, index = texture_atlas
+    entry = index[name]
+    # The frames share the atlas's pixels rather than copying them.
+    frames = [image.subsurface(rect) for rect in entry["frames"]]
+    return frames, entry["origin"]
+
+
+def load_sprite(name, **kwargs):
+    # Load a sprite from the asset cache if it is there, or else from
+    # the texture atlas or its own file in DATA_IMAGES.
+    start = time.perf_counter()
+    if asset_cache is not None:
+        cached = asset_cache.get(name)
+        if cached is not None:
+            sprite = sprite_from_images(cached[0], **kwargs)
+            add_startup_phase("sprite {} (cached)".format(name), start)
+            return sprite
+
+    # Loading the atlas itself is counted as a phase of its own
+    packed = load_from_atlas(name)
+    start = time.perf_counter()
+    if packed is not None:
+        frames, origin = packed
+        kwargs.setdefault("origin_x", origin[0])
+        kwargs.setdefault("origin_y", origin[1])
+        sprite = sprite_from_images(frames, **kwargs)
+        add_startup_phase("sprite {} (atlas)".format(name), start)
+    else:
+        sprite = sge.gfx.Sprite(name, DATA_IMAGES, **kwargs)
+        add_startup_phase("sprite {}".format(name), start)
+
+    if asset_cache is not None:
+        asset_cache.put(name, sprite.rd["baseimages"])
+
+    return sprite
+
+
+def load_nebula(name):
+    # Load a nebula sprite already cut into pieces (see cut_nebula),
+    # from the asset cache if it is there.
+    start = time.perf_counter()
+    key = "{}/pieces{}".format(name, NEBULA_TILE_SIZE)
+    if asset_cache is not None:
+        cached = asset_cache.get(key)
+        if cached is not None:
+            images, info = cached
+            add_startup_phase("sprite {} (cached)".format(name), start)
+            return (sprite_from_images(images),) + tuple(info)
+
+    nebula = cut_nebula(sge.gfx.Sprite(name, DATA_IMAGES))
+    if asset_cache is not None:
+        asset_cache.put(key, nebula[0].rd["baseimages"], nebula[1:])
+
+    add_startup_phase("sprite {}".format(name), start)
+    return nebula
+
+
 def load_sound(*args, **kwargs):
     # Load a sound if available, or otherwise return a blank sound
+    start = time.perf_counter()
     try:
         snd = sge.snd.Sound(*args, **kwargs)
     except OSError as e:
         snd = sge.snd.Sound(None)
         warnings.warn(str(e))
 
+    add_startup_phase("sound {}".format(os.path.basename(args[0])), start)
     return snd
 
 
-# Create Game object
-Game(width=1280, height=720, scale=SCALE, scale_method="smooth", fps=30,
-     delta=True, delta_min=15, delta_max=120, window_text="Pacewar",
-     window_icon=os.path.join(DATA_IMAGES, "icon.png"))
-
-# Load sprites
-r1_sprite = sge.gfx.Sprite(
-    "Spaceship14", DATA_IMAGES, origin_x=17, origin_y=31, bbox_x=-17,
-    bbox_y=-17, bbox_width=33, bbox_height=33)
-g1_sprite = sge.gfx.Sprite(
-    "Spaceship14B", DATA_IMAGES, origin_x=17, origin_y=31, bbox_x=-17,
-    bbox_y=-17, bbox_width=33, bbox_height=33)
-r2_sprite = sge.gfx.Sprite(
-    "Spaceship15", DATA_IMAGES, origin_x=16, origin_y=18, bbox_x=-16,
-    bbox_y=-16, bbox_width=32, bbox_height=32)
-g2_sprite = sge.gfx.Sprite(
-    "Spaceship15B", DATA_IMAGES, origin_x=16, origin_y=18, bbox_x=-16,
-    bbox_y=-16, bbox_width=32, bbox_height=32)
-r3_sprite = sge.gfx.Sprite(
-    "Spaceship16", DATA_IMAGES, origin_x=14, origin_y=18, bbox_x=-14,
-    bbox_y=-14, bbox_width=28, bbox_height=28)
-g3_sprite = sge.gfx.Sprite(
-    "Spaceship16B", DATA_IMAGES, origin_x=14, origin_y=18, bbox_x=-14,
-    bbox_y=-14, bbox_width=28, bbox_height=28)
-e1_sprite = sge.gfx.Sprite("Exhaust14", DATA_IMAGES, origin_x=6, origin_y=-13,
-                           fps=60)
-e2_sprite = sge.gfx.Sprite("Exhaust15", DATA_IMAGES, origin_x=7, origin_y=-9,
-                           fps=60)
-e3_sprite = sge.gfx.Sprite("Exhaust16", DATA_IMAGES, origin_x=3, origin_y=-10,
-                           fps=60)
-
-ship_sprites = {TEAM_RED: [r1_sprite, r2_sprite, r3_sprite],
-                TEAM_GREEN: [g1_sprite, g2_sprite, g3_sprite]}
-exhaust_sprites = {id(r1_sprite): e1_sprite, id(g1_sprite): e1_sprite,
-                   id(r2_sprite): e2_sprite, id(g2_sprite): e2_sprite,
-                   id(r3_sprite): e3_sprite, id(g3_sprite): e3_sprite}
-
-explosion_sprite = sge.gfx.Sprite("explosion", DATA_IMAGES, origin_x=32,
-                                  origin_y=32, fps=30)
-bullet_sprites = {TEAM_RED: sge.gfx.Sprite("bullet_red", DATA_IMAGES,
-                                           origin_x=8, origin_y=16),
-                  TEAM_GREEN: sge.gfx.Sprite("bullet_green", DATA_IMAGES,
-                                             origin_x=8, origin_y=16)}
-stars_sprite = sge.gfx.Sprite("Stars", DATA_IMAGES, transparent=False)
-nebula_sprites = [sge.gfx.Sprite("Nebula1", DATA_IMAGES),
-                  sge.gfx.Sprite("Nebula2", DATA_IMAGES),
-                  sge.gfx.Sprite("Nebula3", DATA_IMAGES)]
-target_sprite = sge.gfx.Sprite("target", DATA_IMAGES, width=80, height=80,
-                               origin_x=40, origin_y=40)
-logo_sprite = sge.gfx.Sprite("logo", DATA_IMAGES, origin_x=321)
-colorblind_sprites = {TEAM_RED: sge.gfx.Sprite("colorblind_red", DATA_IMAGES),
-                      TEAM_GREEN: sge.gfx.Sprite("colorblind_green",
-                                                 DATA_IMAGES)}
-font_sprite = sge.gfx.Sprite("font", DATA_IMAGES)
-font_selected_sprite = sge.gfx.Sprite("font_selected", DATA_IMAGES)
-meter_left_sprite = sge.gfx.Sprite("meter_left", DATA_IMAGES)
-meter_right_sprite = sge.gfx.Sprite("meter_right", DATA_IMAGES)
-meter_center_sprite = sge.gfx.Sprite("meter_center", DATA_IMAGES, transparent=False)
-meter_back_sprite = sge.gfx.Sprite("meter_back", DATA_IMAGES, transparent=False)
-meter_sprites = {TEAM_RED: sge.gfx.Sprite("meter_red", DATA_IMAGES,
-                                          origin_x=37),
-                 TEAM_GREEN: sge.gfx.Sprite("meter_green", DATA_IMAGES)}
-meter_w = (meter_left_sprite.width + meter_right_sprite.width +
-           meter_center_sprite.width +
-           meter_back_sprite.width * points_to_win * 2)
-meter_sprite = sge.gfx.Sprite(width=meter_w, height=16)
-
-# Load backgrounds
-layers = []
-layers.append(sge.gfx.BackgroundLayer(stars_sprite, 0, 0, -1000,
-                                      xscroll_rate=0.05, yscroll_rate=0.01,
-                                      repeat_left=True, repeat_right=True,
-                                      repeat_up=True, repeat_down=True))
-layers.append(create_nebula(15, -100, 0.1))
-layers.append(create_nebula(30, -50, 0.5))
-layers.append(create_nebula(5, 5, 1))
-
-background = sge.gfx.Background(layers, sge.gfx.Color("black"))
-
-# Load sounds
-shoot_sound = load_sound(os.path.join(DATA_SOUNDS, "shoot.wav"))
-explode_sound = load_sound(os.path.join(DATA_SOUNDS, "explode.wav"))
-dissipate_sound = load_sound(os.path.join(DATA_SOUNDS, "dissipate.ogg"))
-select_sound = load_sound(os.path.join(DATA_SOUNDS, "select.ogg"), volume=0.5)
-
-# Load music
-try:
-    music = sge.snd.Music(os.path.join(DATA_MUSIC,
-                                       "DST-RailJet-LongSeamlessLoop.ogg"))
-except OSError as e:
-    music = sge.snd.Music(None)
-    warnings.warn(str(e))
-
-# Load fonts
-chars = [' ', '!', '"', '#', '$', '%', '&', "'", '(', ')', '*', '+', ',',
-         '-', '.', '/', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
-         ':', ';', '<', '=', '>', '?', '@', 'A', 'B', 'C', 'D', 'E', 'F',
-         'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S',
-         'T', 'U', 'V', 'W', 'X', 'Y', 'Z', '[', '\\', ']', '^', '_', '`',
-         'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm',
-         'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'x', 'y', 'z',
-         '{', '|', '}', '~']
-menu_font = sge.gfx.Font.from_sprite(font_sprite, chars, size=24)
-selection_font = sge.gfx.Font.from_sprite(font_selected_sprite, chars, size=24)
-
-pause_sprite = sge.gfx.Sprite.from_text(menu_font, "Paused")
-sge.game.scale_method = "noblur"
-pause_sprite.width *= 2
-pause_sprite.height *= 2
-sge.game.scale_method = "smooth"
-
-# Create room
-sge.game.start_room = create_room()
-
-sge.game.scale = None
-sge.game.mouse.visible = False
-
-if not os.path.exists(CONFIG_DIR):
-    os.makedirs(CONFIG_DIR)
+def load_music():
+    # Load the music, and start it if a game is already being played.
+    global music
 
-try:
-    with open(os.path.join(CONFIG_DIR, "keys.json"), 'r') as f:
-        keys_cfg = json.load(f)
-except (IOError, ValueError):
-    pass
-else:
-    player1_key_thrust = keys_cfg.get("player1_thrust", player1_key_thrust)
-    player1_key_left = keys_cfg.get("player1_left", player1_key_left)
-    player1_key_right = keys_cfg.get("player1_right", player1_key_right)
-    player1_key_shoot = keys_cfg.get("player1_shoot", player1_key_shoot)
-    player2_key_thrust = keys_cfg.get("player2_thrust", player2_key_thrust)
-    player2_key_left = keys_cfg.get("player2_left", player2_key_left)
-    player2_key_right = keys_cfg.get("player2_right", player2_key_right)
-    player2_key_shoot = keys_cfg.get("player2_shoot", player2_key_shoot)
+    start = time.perf_counter()
+    try:
+        music = sge.snd.Music(os.path.join(DATA_MUSIC,
+                                           "DST-RailJet-LongSeamlessLoop.ogg"))
+    except OSError as e:
+        music = sge.snd.Music(None)
+        warnings.warn(str(e))
 
-try:
-    with open(os.path.join(CONFIG_DIR, "joystick.json"), 'r') as f:
-        js_cfg = json.load(f)
-except (OSError, ValueError):
-    pass
-else:
-    player1_js_thrust = tuple(js_cfg.get("player1_thrust",
-                                         player1_js_thrust))
-    player1_js_left = tuple(js_cfg.get("player1_left", player1_js_left))
-    player1_js_right = tuple(js_cfg.get("player1_right", player1_js_right))
-    player1_js_shoot = tuple(js_cfg.get("player1_shoot", player1_js_shoot))
-    player2_js_thrust = tuple(js_cfg.get("player2_thrust",
-                                         player2_js_thrust))
-    player2_js_left = tuple(js_cfg.get("player2_left", player2_js_left))
-    player2_js_right = tuple(js_cfg.get("player2_right", player2_js_right))
-    player2_js_shoot = tuple(js_cfg.get("player2_shoot", player2_js_shoot))
+    add_startup_phase("music", start)
+
+
+def load_game_sounds():
+    # Load the sounds which are only heard during battles.
+    global shoot_sound
+    global explode_sound
+    global dissipate_sound
+
+    shoot_sound = load_sound(os.path.join(DATA_SOUNDS, "shoot.wav"),
+                             max_play=VOICE_BUDGETS["shoot"])
+    explode_sound = load_sound(os.path.join(DATA_SOUNDS, "explode.wav"),
+                               max_play=VOICE_BUDGETS["explode"])
+    dissipate_sound = load_sound(os.path.join(DATA_SOUNDS, "dissipate.ogg"),
+                                 max_play=VOICE_BUDGETS["dissipate"])
+
+
+def load_exhaust():
+    # Load the exhaust animations and pair them with the ship sprites.
+    global exhaust_sprites
+
+    e1_sprite = load_sprite("Exhaust14", origin_x=6, origin_y=-13, fps=60)
+    e2_sprite = load_sprite("Exhaust15", origin_x=7, origin_y=-9, fps=60)
+    e3_sprite = load_sprite("Exhaust16", origin_x=3, origin_y=-10, fps=60)
+    exhaust_sprites = {}
+    for team in [TEAM_RED, TEAM_GREEN]:
+        for sprite, exhaust in zip(ship_sprites[team],
+                                   [e1_sprite, e2_sprite, e3_sprite]):
+            exhaust_sprites[id(sprite)] = exhaust
+
+
+def load_explosion():
+    global explosion_sprite
+    explosion_sprite = load_sprite("explosion", origin_x=32, origin_y=32,
+                                   fps=30)
+
+
+def add_startup_phase(name, start):
+    # Add the time since start to the startup report, if there is one.
+    if startup_report is not None:
+        startup_report["phases"].append((name, time.perf_counter() - start))
+
+
+def print_startup_report():
+    # Print the startup report once the first frame has been shown and
+    # everything has been loaded.
+    global startup_report
+
+    if startup_report["first_frame"] is None:
+        startup_report["first_frame"] = time.perf_counter()
+        add_startup_phase("first room and frame",
+                          startup_report["game_start"])
+    if asset_loader is not None and asset_loader.queue:
+        return
+
+    print("Startup report (milliseconds):")
+    print("{:>10.1f}  interpreter start and imports (CPU time)".format(
+        IMPORT_TIME * 1000))
+    for name, seconds in startup_report["phases"]:
+        print("{:>10.1f}  {}".format(seconds * 1000, name))
+    print("{:>10.1f}  main() to first frame".format(
+        (startup_report["first_frame"] - startup_report["start"]) * 1000))
+    startup_report = None
+
+
+def create_game():
+    # Create the Game object.
+    global view_index
+
+    view_index = ViewIndex()
+    if headless:
+        # Run without a window or audio device.
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        HeadlessGame(width=1280, height=720, fps=30, window_text="Pacewar")
+    else:
+        Game(width=1280, height=720, scale=SCALE, scale_method="smooth",
+             fps=30, delta=(seed is None), delta_min=15, delta_max=120,
+             window_text="Pacewar",
+             window_icon=os.path.join(DATA_IMAGES, "icon.png"))
+
+
+def load_assets():
+    # Load all sprites, backgrounds, sounds, music, and fonts.
+    global ship_sprites
+    global exhaust_sprites
+    global explosion_sprite
+    global bullet_sprites
+    global nebula_sprites
+    global nebulae
+    global target_sprite
+    global logo_sprite
+    global colorblind_sprites
+    global meter_left_sprite
+    global meter_right_sprite
+    global meter_center_sprite
+    global meter_back_sprite
+    global meter_sprites
+    global meter_sprite
+    global background
+    global shoot_sound
+    global explode_sound
+    global dissipate_sound
+    global select_sound
+    global music
+    global menu_font
+    global selection_font
+    global pause_sprite
+    global rotation_atlas
+    global draw_batch
+    global voices
+    global asset_loader
+
+    if headless:
+        # Ships and bullets use their bounding boxes for collisions, so
+        # nothing needs to be loaded.
+        ship_sprites = {TEAM_RED: [None] * len(SHIP_BBOXES),
+                        TEAM_GREEN: [None] * len(SHIP_BBOXES)}
+        bullet_sprites = {TEAM_RED: None, TEAM_GREEN: None}
+        background = None
+        shoot_sound = sge.snd.Sound(None)
+        explode_sound = sge.snd.Sound(None)
+        dissipate_sound = sge.snd.Sound(None)
+        select_sound = sge.snd.Sound(None)
+        music = sge.snd.Music(None)
+        return
+
+    # Load sprites
+    r1_sprite = load_sprite("Spaceship14", origin_x=17, origin_y=31,
+                            bbox_x=-17, bbox_y=-17, bbox_width=33,
+                            bbox_height=33)
+    g1_sprite = load_sprite("Spaceship14B", origin_x=17, origin_y=31,
+                            bbox_x=-17, bbox_y=-17, bbox_width=33,
+                            bbox_height=33)
+    r2_sprite = load_sprite("Spaceship15", origin_x=16, origin_y=18,
+                            bbox_x=-16, bbox_y=-16, bbox_width=32,
+                            bbox_height=32)
+    g2_sprite = load_sprite("Spaceship15B", origin_x=16, origin_y=18,
+                            bbox_x=-16, bbox_y=-16, bbox_width=32,
+                            bbox_height=32)
+    r3_sprite = load_sprite("Spaceship16", origin_x=14, origin_y=18,
+                            bbox_x=-14, bbox_y=-14, bbox_width=28,
+                            bbox_height=28)
+    g3_sprite = load_sprite("Spaceship16B", origin_x=14, origin_y=18,
+                            bbox_x=-14, bbox_y=-14, bbox_width=28,
+                            bbox_height=28)
+
+    ship_sprites = {TEAM_RED: [r1_sprite, r2_sprite, r3_sprite],
+                    TEAM_GREEN: [g1_sprite, g2_sprite, g3_sprite]}
+    rotation_atlas = RotationAtlas(rotation_steps)
+    draw_batch = DrawBatch()
+    voices = VoiceManager()
+
+    bullet_sprites = {TEAM_RED: load_sprite("bullet_red", origin_x=8,
+                                            origin_y=16),
+                      TEAM_GREEN: load_sprite("bullet_green", origin_x=8,
+                                              origin_y=16)}
+    stars_sprite = load_sprite("Stars", transparent=False)
+    nebula_sprites = [load_nebula("Nebula1"), load_nebula("Nebula2"),
+                      load_nebula("Nebula3")]
+    target_sprite = load_sprite("target", width=80, height=80, origin_x=40,
+                                origin_y=40)
+    logo_sprite = load_sprite("logo", origin_x=321)
+    colorblind_sprites = {
+        TEAM_RED: load_sprite("colorblind_red"),
+        TEAM_GREEN: load_sprite("colorblind_green")}
+    font_sprite = load_sprite("font")
+    font_selected_sprite = load_sprite("font_selected")
+    meter_left_sprite = load_sprite("meter_left")
+    meter_right_sprite = load_sprite("meter_right")
+    meter_center_sprite = load_sprite("meter_center", transparent=False)
+    meter_back_sprite = load_sprite("meter_back", transparent=False)
+    meter_sprites = {TEAM_RED: load_sprite("meter_red", origin_x=37),
+                     TEAM_GREEN: load_sprite("meter_green")}
+    meter_w = (meter_left_sprite.width + meter_right_sprite.width +
+               meter_center_sprite.width +
+               meter_back_sprite.width * points_to_win * 2)
+    meter_sprite = sge.gfx.Sprite(width=meter_w, height=16)
+
+    # Load backgrounds
+    layers = []
+    layers.append(sge.gfx.BackgroundLayer(stars_sprite, 0, 0, -1000,
+                                          xscroll_rate=0.05, yscroll_rate=0.01,
+                                          repeat_left=True, repeat_right=True,
+                                          repeat_up=True, repeat_down=True))
+    start = time.perf_counter()
+    nebulae = [NebulaLayer(15, -100, 0.1, random.getrandbits(32)),
+               NebulaLayer(30, -50, 0.5, random.getrandbits(32)),
+               NebulaLayer(5, 5, 1, random.getrandbits(32))]
+    add_startup_phase("nebula layers", start)
+
+    background = sge.gfx.Background(layers, sge.gfx.Color("black"))
+
+    # Load sounds
+    select_sound = load_sound(os.path.join(DATA_SOUNDS, "select.ogg"),
+                              volume=0.5)
+
+    # Load fonts
+    start = time.perf_counter()
+    chars = [' ', '!', '"', '#', '$', '%', '&', "'", '(', ')', '*', '+', ',',
+             '-', '.', '/', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9',
+             ':', ';', '<', '=', '>', '?', '@', 'A', 'B', 'C', 'D', 'E', 'F',
+             'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S',
+             'T', 'U', 'V', 'W', 'X', 'Y', 'Z', '[', '\\', ']', '^', '_', '`',
+             'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm',
+             'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'x', 'y', 'z',
+             '{', '|', '}', '~']
+    menu_font = sge.gfx.Font.from_sprite(font_sprite, chars, size=24)
+    selection_font = sge.gfx.Font.from_sprite(font_selected_sprite, chars,
+                                              size=24)
+
+    add_startup_phase("fonts", start)
+
+    start = time.perf_counter()
+    cached = asset_cache.get("pause") if asset_cache is not None else None
+    if cached is not None:
+        pause_sprite = sprite_from_images(cached[0])
+    else:
+        pause_sprite = sge.gfx.Sprite.from_text(menu_font, "Paused")
+        sge.game.scale_method = "noblur"
+        pause_sprite.width *= 2
+        pause_sprite.height *= 2
+        sge.game.scale_method = "smooth"
+        if asset_cache is not None:
+            asset_cache.put("pause", pause_sprite.rd["baseimages"])
+    add_startup_phase("pause sprite", start)
+
+    # Everything else is only needed once battles get going, so it is
+    # loaded while the menu is shown.
+    exhaust_sprites = {}
+    explosion_sprite = None
+    shoot_sound = sge.snd.Sound(None)
+    explode_sound = sge.snd.Sound(None)
+    dissipate_sound = sge.snd.Sound(None)
+    music = sge.snd.Music(None)
+    asset_loader = AssetLoader()
+    asset_loader.add(load_exhaust)
+    asset_loader.add(load_explosion)
+    asset_loader.add(load_game_sounds)
+    asset_loader.add(load_music)
+
+    if asset_cache is not None:
+        asset_cache.save()
+
+
+def load_config():
+    # Load the key and joystick configuration from CONFIG_DIR.
+    global player1_key_thrust
+    global player1_key_left
+    global player1_key_right
+    global player1_key_shoot
+    global player2_key_thrust
+    global player2_key_left
+    global player2_key_right
+    global player2_key_shoot
+    global player1_js_thrust
+    global player1_js_left
+    global player1_js_right
+    global player1_js_shoot
+    global player2_js_thrust
+    global player2_js_left
+    global player2_js_right
+    global player2_js_shoot
+
+    if not os.path.exists(CONFIG_DIR):
+        os.makedirs(CONFIG_DIR)
 
+    try:
+        with open(os.path.join(CONFIG_DIR, "keys.json"), 'r') as f:
+            keys_cfg = json.load(f)
+    except (IOError, ValueError):
+        pass
+    else:
+        player1_key_thrust = keys_cfg.get("player1_thrust", player1_key_thrust)
+        player1_key_left = keys_cfg.get("player1_left", player1_key_left)
+        player1_key_right = keys_cfg.get("player1_right", player1_key_right)
+        player1_key_shoot = keys_cfg.get("player1_shoot", player1_key_shoot)
+        player2_key_thrust = keys_cfg.get("player2_thrust", player2_key_thrust)
+        player2_key_left = keys_cfg.get("player2_left", player2_key_left)
+        player2_key_right = keys_cfg.get("player2_right", player2_key_right)
+        player2_key_shoot = keys_cfg.get("player2_shoot", player2_key_shoot)
 
-if __name__ == '__main__':
     try:
-        sge.game.start()
+        with open(os.path.join(CONFIG_DIR, "joystick.json"), 'r') as f:
+            js_cfg = json.load(f)
+    except (OSError, ValueError):
+        pass
+    else:
+        player1_js_thrust = tuple(js_cfg.get("player1_thrust",
+                                             player1_js_thrust))
+        player1_js_left = tuple(js_cfg.get("player1_left", player1_js_left))
+        player1_js_right = tuple(js_cfg.get("player1_right", player1_js_right))
+        player1_js_shoot = tuple(js_cfg.get("player1_shoot", player1_js_shoot))
+        player2_js_thrust = tuple(js_cfg.get("player2_thrust",
+                                             player2_js_thrust))
+        player2_js_left = tuple(js_cfg.get("player2_left", player2_js_left))
+        player2_js_right = tuple(js_cfg.get("player2_right", player2_js_right))
+        player2_js_shoot = tuple(js_cfg.get("player2_shoot", player2_js_shoot))
+
+
+def save_config():
+    # Save the key and joystick configuration to CONFIG_DIR.
+    keys_cfg = {"player1_thrust": player1_key_thrust,
+                "player1_left": player1_key_left,
+                "player1_right": player1_key_right,
+                "player1_shoot": player1_key_shoot,
+                "player2_thrust": player2_key_thrust,
+                "player2_left": player2_key_left,
+                "player2_right": player2_key_right,
+                "player2_shoot": player2_key_shoot}
+    js_cfg = {"player1_thrust": player1_js_thrust,
+              "player1_left": player1_js_left,
+              "player1_right": player1_js_right,
+              "player1_shoot": player1_js_shoot,
+              "player2_thrust": player2_js_thrust,
+              "player2_left": player2_js_left,
+              "player2_right": player2_js_right,
+              "player2_shoot": player2_js_shoot}
+
+    with open(os.path.join(CONFIG_DIR, "keys.json"), 'w') as f:
+        json.dump(keys_cfg, f)
+
+    with open(os.path.join(CONFIG_DIR, "joystick.json"), 'w') as f:
+        json.dump(js_cfg, f)
+
+
+def set_seed(value):
+    # Seed the simulation, or with None, go back to unseeded play.
+    global seed
+
+    seed = value
+    rng.seed(value)
+    random.seed(value)
+
+
+def run_headless(matches=1, seed=None):
+    # Run AI-vs-AI matches without a window or audio and return a list
+    # of the results.  Runs with the same seed give identical results.
+    global headless
+    global headless_matches
+    global bullet_pool
+    global ship_pool
+
+    headless = True
+    headless_matches = matches
+    del headless_results[:]
+    bullet_pool = None
+    ship_pool = None
+    set_seed(seed)
+
+    create_game()
+    load_assets()
+    sge.game.start_room = create_room()
+    sge.game.start()
+
+    return headless_results[:]
+
+
+def main():
+    global points_to_win
+    global physics
+    global ai_batches
+    global ai_scheduler
+    global swept_collision
+    global profiler
+    global rotation_steps
+    global asset_cache
+    global startup_report
+    global memory_report
+
+    parser = argparse.ArgumentParser(prog="pacewar")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run AI-vs-AI matches as fast as possible without a window or "
+             "audio, printing the result of each match as JSON.")
+    parser.add_argument(
+        "--matches", type=int, default=1,
+        help="The number of matches to run in headless mode (default: 1).")
+    parser.add_argument(
+        "--points", type=int, default=points_to_win,
+        help="The number of points needed to win a headless match "
+             "(default: {}).".format(points_to_win))
+    parser.add_argument(
+        "--numpy-physics", action="store_true",
+        help="Move ships and bullets with the vectorized NumPy physics "
+             "engine.")
+    parser.add_argument(
+        "--batched-ai", action="store_true",
+        help="Make the decisions of all AI-controlled ships on a team in "
+             "one vectorized pass per frame.")
+    parser.add_argument(
+        "--swept-collision", action="store_true",
+        help="Detect bullet hits with swept circles instead of pixel "
+             "masks.")
+    parser.add_argument(
+        "--ai-scheduler", action="store_true",
+        help="Spread AI decisions evenly across ticks and limit the time "
+             "spent on them each tick, making threat checks before "
+             "retargeting.")
+    parser.add_argument(
+        "--ai-budget", type=float, default=AI_BUDGET * 1000,
+        help="Milliseconds of AI decisions allowed per tick with "
+             "--ai-scheduler (default: %(default)s).")
+    parser.add_argument(
+        "--seed", type=int,
+        help="Seed the simulation and use a fixed frame time, so that "
+             "runs with the same seed play out identically.")
+    parser.add_argument(
+        "--rotation-steps", type=int, default=ROTATION_STEPS,
+        help="Number of angles ships, bullets and exhaust are pre-rotated "
+             "to (default: %(default)s).")
+    parser.add_argument(
+        "--profile-trace", metavar="FILE",
+        help="Profile event handlers from the start and write the "
+             "per-frame results of the last ten minutes to FILE in Chrome "
+             "trace format on exit.  "
+             "Profiling can also be toggled in-game with F9.")
+    parser.add_argument(
+        "--no-asset-cache", action="store_true",
+        help="Load every image from its file instead of from the asset "
+             "cache in {}, and don't write the cache.".format(CONFIG_DIR))
+    parser.add_argument(
+        "--startup-report", action="store_true",
+        help="Print how long each part of starting the game took once the "
+             "first frame is shown and everything is loaded.")
+    parser.add_argument(
+        "--memory-report", metavar="FILE",
+        help="At the start and end of every round, append a breakdown of "
+             "memory use by images, sounds and objects to FILE as a line "
+             "of JSON.")
+    args = parser.parse_args()
+
+    if args.memory_report:
+        memory_report = MemoryReport(args.memory_report)
+
+    if args.startup_report:
+        startup_report = {"start": time.perf_counter(), "phases": [],
+                          "game_start": None, "first_frame": None}
+
+    if args.numpy_physics:
+        if numpy is None:
+            parser.error("--numpy-physics requires NumPy")
+        physics = PhysicsEngine()
+
+    if args.batched_ai:
+        if numpy is None:
+            parser.error("--batched-ai requires NumPy")
+        ai_batches = {TEAM_RED: BatchedAI(TEAM_RED),
+                      TEAM_GREEN: BatchedAI(TEAM_GREEN)}
+
+    if args.swept_collision:
+        swept_collision = SweptCollision()
+
+    if args.ai_scheduler:
+        ai_scheduler = AIScheduler(args.ai_budget / 1000)
+
+    if args.rotation_steps < 1:
+        parser.error("--rotation-steps must be at least 1")
+    rotation_steps = args.rotation_steps
+
+    if args.profile_trace:
+        profiler = Profiler(args.profile_trace)
+        profiler.enable()
+
+    try:
+        if args.headless:
+            points_to_win = args.points
+            for result in run_headless(args.matches, args.seed):
+                print(json.dumps(result))
+            return
+
+        if args.seed is not None:
+            set_seed(args.seed)
+
+        load_config()
+        if not args.no_asset_cache:
+            start = time.perf_counter()
+            asset_cache = AssetCache(ASSET_CACHE_FILE)
+            add_startup_phase("asset cache", start)
+        start = time.perf_counter()
+        create_game()
+        add_startup_phase("SGE init", start)
+        load_assets()
+
+        # Create room
+        sge.game.start_room = create_room()
+
+        sge.game.scale = None
+        sge.game.mouse.visible = False
+
+        if startup_report is not None:
+            startup_report["game_start"] = time.perf_counter()
+        try:
+            sge.game.start()
+        finally:
+            save_config()
     finally:
-        keys_cfg = {"player1_thrust": player1_key_thrust,
-                    "player1_left": player1_key_left,
-                    "player1_right": player1_key_right,
-                    "player1_shoot": player1_key_shoot,
-                    "player2_thrust": player2_key_thrust,
-                    "player2_left": player2_key_left,
-                    "player2_right": player2_key_right,
-                    "player2_shoot": player2_key_shoot}
-        js_cfg = {"player1_thrust": player1_js_thrust,
-                  "player1_left": player1_js_left,
-                  "player1_right": player1_js_right,
-                  "player1_shoot": player1_js_shoot,
-                  "player2_thrust": player2_js_thrust,
-                  "player2_left": player2_js_left,
-                  "player2_right": player2_js_right,
-                  "player2_shoot": player2_js_shoot}
-
-        with open(os.path.join(CONFIG_DIR, "keys.json"), 'w') as f:
-            json.dump(keys_cfg, f)
-
-        with open(os.path.join(CONFIG_DIR, "joystick.json"), 'w') as f:
-            json.dump(js_cfg, f)
+        if args.profile_trace:
+            profiler.save_trace()
+
+
+if __name__ == '__main__':
+    main()